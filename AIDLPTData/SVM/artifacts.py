@@ -0,0 +1,162 @@
+import copy
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+# bump whenever the on-disk layout changes; load_artifacts refuses bundles newer than this
+# (2: arrays of Pipeline steps, recorded with the step path they belong to)
+ARTIFACT_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+
+# arrays smaller than this stay inside the estimator pickle, everything else becomes a raw .npy file
+MMAP_MIN_SIZE = 1024
+
+
+def _externalize(name, estimator, array_dir):
+    # shallow copy of the estimator with its large numeric arrays swapped out for .npy files
+    if isinstance(estimator, Pipeline):
+        # every step is externalized on its own, its arrays keyed "step.attr" with the step path to restore them
+        skeleton = copy.copy(estimator)
+        skeleton.steps = []
+        arrays = {}
+        for step_name, step in estimator.steps:
+            step_skeleton, step_arrays = _externalize(f"{name}.{step_name}", step, array_dir)
+            skeleton.steps.append((step_name, step_skeleton))
+            for key, info in step_arrays.items():
+                arrays[f"{step_name}.{key}"] = {**info, "path": [step_name] + info.get("path", []),
+                                                "attr": info.get("attr", key)}
+        return skeleton, arrays
+    if not hasattr(estimator, "__dict__"):
+        # "passthrough" / None pipeline steps
+        return estimator, {}
+    skeleton = copy.copy(estimator)
+    arrays = {}
+    for attr, value in vars(estimator).items():
+        if not isinstance(value, np.ndarray) or value.dtype == object or value.size < MMAP_MIN_SIZE:
+            continue
+        file_name = f"{name}.{attr}.npy"
+        np.save(array_dir / file_name, np.ascontiguousarray(value), allow_pickle=False)
+        arrays[attr] = {"file": file_name, "dtype": str(value.dtype), "shape": list(value.shape)}
+        setattr(skeleton, attr, None)
+    return skeleton, arrays
+
+
+def _rehydrate(skeleton, arrays, array_dir, mmap_mode):
+    for key, info in arrays.items():
+        target = skeleton
+        for step_name in info.get("path", []):
+            target = target.named_steps[step_name]
+        setattr(target, info.get("attr", key), np.load(array_dir / info["file"], mmap_mode=mmap_mode,
+                                                       allow_pickle=False))
+    return skeleton
+
+
+def save_artifacts(directory, tfidf, pca, kmeans, svm, stats, label_classes=None, extra=None):
+    """Write a versioned model bundle to directory.
+
+    The bundle holds a JSON manifest, the TF-IDF vocabulary as one NUL-separated
+    UTF-8 blob in column order, raw .npy arrays (IDF weights, reducer
+    components, centroids, support vectors, dual coefficients, ...) and a small
+    pickle of the estimators with those arrays stripped out. A Pipeline
+    classifier has the arrays of each of its steps stored the same way. The
+    directory is replaced atomically.
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    array_dir = tmp_dir / "arrays"
+    array_dir.mkdir(parents=True)
+
+    terms = tfidf.get_feature_names_out()
+    if any("\0" in term for term in terms):
+        raise ValueError("Vocabulary terms may not contain NUL characters")
+    with open(tmp_dir / "vocabulary.bin", "wb") as f:
+        f.write("\0".join(terms).encode("utf-8"))
+    np.save(array_dir / "tfidf.idf_.npy", np.ascontiguousarray(tfidf.idf_, dtype=np.float64), allow_pickle=False)
+
+    components = {
+        "tfidf": {
+            "type": type(tfidf).__name__,
+            "vocabulary": "vocabulary.bin",
+            "vocabulary_size": len(terms),
+            "arrays": {"idf_": {"file": "tfidf.idf_.npy", "dtype": "float64", "shape": [len(terms)]}},
+        }
+    }
+    # the vectorizer is stored unfitted (params only), its vocabulary and idf live in the files above
+    skeletons = {"tfidf": clone(tfidf)}
+    for name, estimator in (("pca", pca), ("kmeans", kmeans), ("svm", svm)):
+        skeletons[name], arrays = _externalize(name, estimator, array_dir)
+        components[name] = {"type": type(estimator).__name__, "arrays": arrays}
+        if isinstance(estimator, Pipeline):
+            components[name]["steps"] = [[step_name, type(step).__name__] for step_name, step in estimator.steps]
+    with open(tmp_dir / "estimators.pkl", "wb") as f:
+        pickle.dump(skeletons, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "components": components,
+        "stats": {key: float(value) for key, value in stats.items()},
+        "label_classes": [value.item() if hasattr(value, "item") else value for value in label_classes]
+        if label_classes is not None else None,
+        "extra": extra or {},
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # swap the finished bundle into place
+    old_dir = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_artifacts(directory, mmap_mode="r"):
+    """Load a bundle written by save_artifacts.
+
+    With mmap_mode="r" every large array is a read-only memory map, so processes
+    serving the same bundle share one copy through the page cache. Returns a
+    dict with the same keys as models.pkl plus 'svm', 'label_classes',
+    'extra' and 'manifest'.
+    """
+    directory = Path(directory)
+    with open(directory / MANIFEST_NAME, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version", 0) > ARTIFACT_VERSION:
+        raise ValueError(f"Artifact version {manifest.get('version')} is newer than supported ({ARTIFACT_VERSION})")
+
+    array_dir = directory / "arrays"
+    components = manifest["components"]
+    with open(directory / "estimators.pkl", "rb") as f:
+        skeletons = pickle.load(f)
+
+    tfidf = skeletons["tfidf"]
+    with open(directory / components["tfidf"]["vocabulary"], "rb") as f:
+        blob = f.read().decode("utf-8")
+    terms = blob.split("\0") if blob else []
+    if len(terms) != components["tfidf"]["vocabulary_size"]:
+        raise ValueError("Vocabulary size does not match the manifest")
+    tfidf.vocabulary_ = {term: index for index, term in enumerate(terms)}
+    tfidf.idf_ = np.load(array_dir / components["tfidf"]["arrays"]["idf_"]["file"], mmap_mode=mmap_mode)
+
+    models = {
+        name: _rehydrate(skeletons[name], components[name]["arrays"], array_dir, mmap_mode)
+        for name in ("pca", "kmeans", "svm")
+    }
+    return {
+        "tfidf": tfidf,
+        **models,
+        **manifest["stats"],
+        "label_classes": manifest["label_classes"],
+        "extra": manifest["extra"],
+        "manifest": manifest,
+    }
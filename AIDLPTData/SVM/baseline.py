@@ -3,62 +3,74 @@ import numpy as np
 import nltk
 import spacy
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA, IncrementalPCA, TruncatedSVD
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.svm import SVC
 from sklearn.preprocessing import LabelEncoder
-from scipy.special import kl_div
+from scipy.special import rel_entr
 import pickle
 from pathlib import Path
 
 nltk.download('punkt')
 nlp = spacy.load("en_core_web_sm")
 
-def word_count(text):
-    return len(nltk.word_tokenize(text))
-
-def sentence_lengths(text):
-    # straightforward, using nltk instead of .split() to handle punctuation and edge cases (according to ChatGPT)
-    doc = nlp(text)
-    res = [] 
-    for sent in doc.sents:
-        res.append(len(nltk.word_tokenize(sent.text)))
-    return res
-
-def compute_kl_divergence(tfidf_vector, vocab_size):
-    # sparse TFIDF vector to a dense array
-    tfidf_dense = tfidf_vector.toarray()[0]
-
-    # total weight (sum of TFIDF values)
-    total = tfidf_dense.sum()
-
-    # normalize to get a probability dist when > 0 
-    if total > 0:
-        p = tfidf_dense / total
-    else:
-        # if 0, use normal dist 
-        p = np.ones(vocab_size) / vocab_size
-
-    # uniform dist to compare 
-    q = np.ones(vocab_size) / vocab_size
-
-    # KL divergence between p and q
-    divergence = kl_div(p, q)
-
-    # sum for final score 
-    return divergence.sum()
-
-def compute_train_statistics(train_docs):
-
-    # word count per doc using pre-def function 
+# pipeline components that play no part in sentence segmentation, the parser
+# (and the tok2vec layer it listens to) is all we need for doc.sents
+UNUSED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer", "ner"]
+
+# "pca" (dense), "svd" (sparse TruncatedSVD) or "incremental" (chunked IncrementalPCA), see build_pca_kmeans
+REDUCTION_METHOD = "pca"
+
+# "kmeans" (full Lloyd iterations) or "minibatch" (MiniBatchKMeans, stops early once batches stop improving)
+CLUSTERING_METHOD = "kmeans"
+
+def tokenize_documents(docs, batch_size=256, n_process=1):
+    # parse every document exactly once, in batches, with the unused components switched off
+    disabled = [name for name in UNUSED_COMPONENTS if name in nlp.pipe_names]
+
+    # per document, the nltk word count of each of its sentences
+    # the document word count is just the sum of these, so no second tokenization pass is needed
+    doc_sentence_lengths = []
+    for doc in nlp.pipe(docs, batch_size=batch_size, n_process=n_process, disable=disabled):
+        res = []
+        for sent in doc.sents:
+            res.append(len(nltk.word_tokenize(sent.text)))
+        doc_sentence_lengths.append(res)
+    return doc_sentence_lengths
+
+def compute_kl_divergence_batch(tfidf_matrix, vocab_size):
+    # KL divergence of each document's normalized TFIDF weights from the uniform distribution
+    # over the vocabulary, for every row of the TFIDF matrix at once and without ever building
+    # a dense vocabulary-sized vector
+    tfidf_matrix = tfidf_matrix.tocsr()
+    n_rows = tfidf_matrix.shape[0]
+
+    # row index of every stored (nonzero) value
+    rows = np.repeat(np.arange(n_rows), np.diff(tfidf_matrix.indptr))
+
+    # normalize the nonzeros by their row total to get p
+    totals = np.asarray(tfidf_matrix.sum(axis=1)).ravel()[rows]
+    p = np.divide(tfidf_matrix.data, totals, out=np.zeros(len(rows)), where=totals > 0)
+
+    # kl_div(p, q) = p*log(p/q) - p + q, summed over the vocabulary the -p and +q terms cancel
+    # (both distributions sum to 1), and zero entries of p add nothing to p*log(p/q)
+    # so only the nonzeros are needed; an all-zero row falls back to p = q and scores 0
+    return np.bincount(rows, weights=rel_entr(p, 1.0 / vocab_size), minlength=n_rows)
+
+def compute_train_statistics(train_docs, doc_sentence_lengths=None):
+    # reuse the tokenization pass if the caller already ran it
+    if doc_sentence_lengths is None:
+        doc_sentence_lengths = tokenize_documents(train_docs)
+
+    # word count per doc, the sum of its sentence word counts
     doc_word_count = []
-    for doc in train_docs: 
-        doc_word_count.append(word_count(doc))
+    for lengths in doc_sentence_lengths:
+        doc_word_count.append(sum(lengths))
 
     # word count per sentence per doc  
     sentence_word_counts = []
-    for doc in train_docs:
-        sentence_word_counts.extend(sentence_lengths(doc))
+    for lengths in doc_sentence_lengths:
+        sentence_word_counts.extend(lengths)
 
     mean_doc_wc = np.mean(doc_word_count)
     std_doc_wc = np.std(doc_word_count)
@@ -90,46 +102,99 @@ def build_tfidf(train_docs, dev_docs):
 
     return tfidf, tfidf_train, tfidf_dev, vocab_size
 
-def build_pca_kmeans(tfidf_train):
-    # convert the sparse TFIDF matrix to a dense NumPy array
-    # necessary because PCA does not accept sparse input
-    tfidf_dense = tfidf_train.toarray()
-
-    # create a PCA (Principal Component Analysis) object to reduce dimensionality.
-    # we set n_components=2 because we want to reduce the original TFIDF vectors (which may have thousands of dimensions)
-    # into 2 dimensions, helps with visualizations and simplifies clustering
-    pca = PCA(n_components=2)
-
-    # fit the PCA model to the dense TFIDF vectors and transform them.
-    # this line does two things:
-    #   - learns the top 2 principal components (directions of highest variance in the data)
-    #   - projects each TFIDF vector onto these 2 components
-    # the result is a new matrix of shape (num_documents, 2)
-    tfidf_pca = pca.fit_transform(tfidf_dense)
+def build_pca_kmeans(tfidf_train, method="pca", chunk_size=1000, clustering="kmeans", batch_size=1024):
+    # method picks how the TFIDF vectors get reduced:
+    #   - "pca": the original approach, densifies the whole matrix (N x V floats), fine for small sets
+    #   - "svd": TruncatedSVD, works on the sparse matrix directly so memory follows the number of nonzeros
+    #   - "incremental": IncrementalPCA fed chunk_size rows at a time, only one chunk is ever dense
+    if method == "pca":
+        # convert the sparse TFIDF matrix to a dense NumPy array
+        # necessary because PCA does not accept sparse input
+        tfidf_dense = tfidf_train.toarray()
+
+        # create a PCA (Principal Component Analysis) object to reduce dimensionality.
+        # we set n_components=2 because we want to reduce the original TFIDF vectors (which may have thousands of dimensions)
+        # into 2 dimensions, helps with visualizations and simplifies clustering
+        pca = PCA(n_components=2)
+
+        # fit the PCA model to the dense TFIDF vectors and transform them.
+        # this line does two things:
+        #   - learns the top 2 principal components (directions of highest variance in the data)
+        #   - projects each TFIDF vector onto these 2 components
+        # the result is a new matrix of shape (num_documents, 2)
+        tfidf_pca = pca.fit_transform(tfidf_dense)
+    elif method == "svd":
+        # no centering, so the sparse matrix never has to be densified
+        pca = TruncatedSVD(n_components=2, random_state=42)
+        tfidf_pca = pca.fit_transform(tfidf_train)
+    elif method == "incremental":
+        pca = IncrementalPCA(n_components=2)
+        n_rows = tfidf_train.shape[0]
+        starts = list(range(0, n_rows, chunk_size))
+        # partial_fit needs at least n_components rows per chunk, fold a tiny last chunk into the one before it
+        if len(starts) > 1 and n_rows - starts[-1] < 2:
+            starts.pop()
+        for start, end in zip(starts, starts[1:] + [n_rows]):
+            pca.partial_fit(tfidf_train[start:end].toarray())
+        tfidf_pca = reduce_tfidf(pca, tfidf_train, chunk_size)
+    else:
+        raise ValueError(f"Unknown reduction method: {method}")
 
     # create a KMeans clustering model
     # we choose 200 clusters arbitrarily to represent different "types" or "themes" of documents in the data
     # the random_state ensures reproducibility (you get the same clusters every time you run it)
-    kmeans = KMeans(n_clusters=200, random_state=42)
+    if clustering == "kmeans":
+        kmeans = KMeans(n_clusters=200, random_state=42)
+    elif clustering == "minibatch":
+        # same nearest-centroid model, but each step only looks at batch_size documents
+        # and fitting stops after 10 batches in a row without improvement
+        kmeans = MiniBatchKMeans(n_clusters=200, batch_size=batch_size, max_no_improvement=10, random_state=42)
+    else:
+        raise ValueError(f"Unknown clustering method: {clustering}")
 
     # fit the KMeans model to the 2D PCA-reduced data and assign each document to a cluster
     # this returns a list of cluster indices — one for each document — indicating which group it belongs to
     cluster_indices = kmeans.fit_predict(tfidf_pca)
 
+    # inertia (sum of squared distances to the nearest centroid), lets us compare the two backends
+    print(f"Cluster inertia ({clustering}):", -kmeans.score(tfidf_pca))
+
     # return the trained PCA and KMeans models so they can be reused later
     return pca, kmeans
 
-def extract_features_for_docs(docs, tfidf_model, pca_model, kmeans_model, stats, vocab_size):
+def reduce_tfidf(pca_model, tfidf_matrix, chunk_size=1000):
+    # TruncatedSVD takes the sparse matrix as is
+    if isinstance(pca_model, TruncatedSVD):
+        return pca_model.transform(tfidf_matrix)
+
+    # PCA / IncrementalPCA need dense input, so only densify chunk_size rows at a time
+    parts = []
+    for start in range(0, tfidf_matrix.shape[0], chunk_size):
+        parts.append(pca_model.transform(tfidf_matrix[start:start + chunk_size].toarray()))
+    return np.vstack(parts) if parts else np.empty((0, pca_model.n_components_))
+
+def extract_features_for_docs(docs, tfidf_model, pca_model, kmeans_model, stats, vocab_size, doc_sentence_lengths=None):
     mean_doc_wc, std_doc_wc, mean_sent_wc, std_sent_wc = stats
     features = []
 
-    for doc in docs:
+    # one batched spaCy pass for features 1 and 2 instead of parsing each doc inside the loop
+    if doc_sentence_lengths is None:
+        doc_sentence_lengths = tokenize_documents(docs)
+
+    # transform all docs in one call and score feature 3 for the whole matrix at once
+    tfidf_matrix = tfidf_model.transform(docs)
+    kl_scores = compute_kl_divergence_batch(tfidf_matrix, vocab_size)
+
+    # same for feature 4, reduce and cluster the whole matrix (chunked, never fully dense)
+    cluster_ids = kmeans_model.predict(reduce_tfidf(pca_model, tfidf_matrix))
+
+    for i, doc in enumerate(docs):
         # The first feature is just the number of words in the document, minus np.mean(L), all divided by np.std(L).
-        wc = word_count(doc)
+        wc = sum(doc_sentence_lengths[i])
         f1 = (wc - mean_doc_wc) / std_doc_wc
 
         # To calculate the second feature, count the words in each sentence of the document. For each sentence, subtract np.mean(M) from the count and divide the difference by np.std(M). This is the z-score for the sentence. The final feature is the mean over all sentences of these z-scores.
-        sents = sentence_lengths(doc)
+        sents = doc_sentence_lengths[i]
         z_scores = []
         if sents:
             for s in sents:
@@ -141,23 +206,22 @@ def extract_features_for_docs(docs, tfidf_model, pca_model, kmeans_model, stats,
 
         # To calculate the third feature, you first count the number of times each vocabulary word appears in the sentence (the unigram distribution of the document). This should be a list of integers of length V, where V is the size of the vocabulary. Probably the TFIDF code will do this for you. The other distibution you need is just 1/V*np.ones(V). Then you just pass those two distributions
         # to scipy.special.kl_div() (or some other implementation).
-        tfidf_vec = tfidf_model.transform([doc])
-        f3 = compute_kl_divergence(tfidf_vec, vocab_size)
+        f3 = kl_scores[i]
 
         # To calculate the fourth feature, first run the document through TFIDF model you saved. The run the output through the k-means model you saved. This will result in a single integer between 0 and 199.
-        tfidf_reduced = pca_model.transform(tfidf_vec.toarray())
-        f4 = kmeans_model.predict(tfidf_reduced)[0]
+        f4 = cluster_ids[i]
 
         features.append([f1, f2, f3, f4])
 
     return np.array(features)
 
-def save_models(tfidf, pca, kmeans, stats):
+def save_models(tfidf, pca, kmeans, stats, reduction_method="pca"):
     mean_doc_wc, std_doc_wc, mean_sent_wc, std_sent_wc = stats
     with open("models.pkl", "wb") as f:
         pickle.dump({
             'tfidf': tfidf,
             'pca': pca,
+            'reduction_method': reduction_method,
             'kmeans': kmeans,
             'mean_doc_wc': mean_doc_wc,
             'std_doc_wc': std_doc_wc,
@@ -215,8 +279,11 @@ def main():
     dev_docs = data[2]
     dev_labels = data[3]
 
+    # tokenize the training docs once, used for the statistics and again for features 1 and 2
+    train_sentence_lengths = tokenize_documents(train_docs)
+
     # compute statistics
-    stats = compute_train_statistics(train_docs)
+    stats = compute_train_statistics(train_docs, train_sentence_lengths)
 
     # build TFIDF and vocabulary size
     tfidf_build = build_tfidf(train_docs, dev_docs)
@@ -226,12 +293,12 @@ def main():
     vocab_size = tfidf_build[3]
 
     # build PCA and KMeans models
-    pca_kmeans_result = build_pca_kmeans(tfidf_train)
+    pca_kmeans_result = build_pca_kmeans(tfidf_train, method=REDUCTION_METHOD, clustering=CLUSTERING_METHOD)
     pca = pca_kmeans_result[0]
     kmeans = pca_kmeans_result[1]
 
     # save the models
-    save_models(tfidf, pca, kmeans, stats)
+    save_models(tfidf, pca, kmeans, stats, REDUCTION_METHOD)
 
     # encode the labels
     label_encoder = LabelEncoder()
@@ -239,7 +306,7 @@ def main():
     y_dev = label_encoder.transform(dev_labels)
 
     # extract features for train and dev documents
-    X_train = extract_features_for_docs(train_docs, tfidf, pca, kmeans, stats, vocab_size)
+    X_train = extract_features_for_docs(train_docs, tfidf, pca, kmeans, stats, vocab_size, train_sentence_lengths)
     X_dev = extract_features_for_docs(dev_docs, tfidf, pca, kmeans, stats, vocab_size)
 
     # train the SVM and evaluate the model
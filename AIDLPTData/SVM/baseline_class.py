@@ -1,54 +1,156 @@
 import json
+import time
+import hashlib
 import numpy as np
 import nltk
 import spacy
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-from sklearn.svm import SVC
-from sklearn.preprocessing import LabelEncoder
-from scipy.special import kl_div
+from sklearn.decomposition import PCA, IncrementalPCA, TruncatedSVD
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.svm import SVC, LinearSVC
+from sklearn.linear_model import SGDClassifier, LogisticRegression
+from sklearn.kernel_approximation import RBFSampler, Nystroem
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from scipy.special import rel_entr
 import pickle
+from contextlib import nullcontext
 from pathlib import Path
+from feature_cache import FeatureCache
+from artifacts import save_artifacts, load_artifacts
+from instrumentation import RunProfiler
+from incremental import (DRIFT_THRESHOLDS, merge_moments, document_frequencies, recover_document_frequencies,
+                         compute_idf, pad_reducer, update_centroids, incremental_estimator,
+                         own_arrays)
 
 nltk.download('punkt')
 nlp = spacy.load("en_core_web_sm")
 
+# pipeline components that play no part in sentence segmentation, the parser
+# (and the tok2vec layer it listens to) is all we need for doc.sents
+UNUSED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer", "ner"]
+
+# upper bound on passes over the data for the chunked ("incremental") clustering backend
+MAX_CLUSTERING_PASSES = 20
+
+# dimension of the explicit feature map for the approximate kernel classifiers
+KERNEL_MAP_COMPONENTS = 500
+
+CLASSIFIERS = ["svc", "linear_svc", "sgd", "logistic", "rbf_sampler", "nystroem"]
+
+def make_classifier(name, **options):
+    """Build the classifier behind AutoILR.train_svm.
+
+    "svc" is the original kernel SVC, fit in O(n^2)-O(n^3) with a predict cost
+    that grows with the number of support vectors. The other backends are
+    linear-time learners behind a StandardScaler (the feature columns live on
+    very different scales); "rbf_sampler" and "nystroem" approximate the RBF
+    kernel with an explicit feature map in front of a linear SVM. options go
+    to the final estimator, or to the kernel map for gamma / n_components.
+    """
+    if name == "svc":
+        return SVC(**options)
+    if name == "linear_svc":
+        return make_pipeline(StandardScaler(), LinearSVC(**options))
+    if name == "sgd":
+        return make_pipeline(StandardScaler(), SGDClassifier(**{"random_state": 42, **options}))
+    if name == "logistic":
+        return make_pipeline(StandardScaler(), LogisticRegression(**{"max_iter": 1000, **options}))
+    if name in ("rbf_sampler", "nystroem"):
+        kernel_options = {"n_components": options.pop("n_components", KERNEL_MAP_COMPONENTS), "random_state": 42}
+        if "gamma" in options:
+            kernel_options["gamma"] = options.pop("gamma")
+        kernel_map = RBFSampler(**kernel_options) if name == "rbf_sampler" else Nystroem(kernel="rbf", **kernel_options)
+        return make_pipeline(StandardScaler(), kernel_map, LinearSVC(**options))
+    raise ValueError(f"Unknown classifier: {name}")
+
 class AutoILR:
     def __init__(self, trainingPath="trainEnglish.json", devPath="devEnglish.json",
-                 desiredFeatures=[1, 2, 3, 4], numberPCAComponents=10, numberClusters=300):
+                 desiredFeatures=[1, 2, 3, 4], numberPCAComponents=10, numberClusters=300,
+                 batchSize=256, nProcess=1, reductionMethod="pca", reductionChunkSize=1000,
+                 clusteringMethod="kmeans", clusteringBatchSize=1024, clusteringMaxNoImprovement=10,
+                 clusteringTol=1e-3, compareInertia=False, featureCacheDir=None, featureCacheMaxBytes=1 << 30,
+                 artifactDir="ilr_artifacts", legacyPickles=True, profile=False, traceMemory=True,
+                 profileReport=None, profilePrometheus=None, classifier="svc", classifierOptions=None):
         self.trainingPath = Path(trainingPath)
         self.devPath = Path(devPath)
         self.desiredFeatures = desiredFeatures
         self.numberPCAComponents = numberPCAComponents
         self.numberClusters = numberClusters
+        self.batchSize = batchSize
+        self.nProcess = nProcess
+        # "pca" densifies the whole training matrix, "svd" (TruncatedSVD) works on the sparse matrix
+        # directly and "incremental" (IncrementalPCA) only ever densifies reductionChunkSize rows
+        self.reductionMethod = reductionMethod
+        self.reductionChunkSize = reductionChunkSize
+        # "kmeans" runs full Lloyd iterations, "minibatch" fits MiniBatchKMeans with early stopping after
+        # clusteringMaxNoImprovement stale batches, "incremental" partial_fits clusteringBatchSize chunks and
+        # stops once a pass improves inertia by less than clusteringTol; compareInertia also fits full KMeans
+        # to report how far the approximate backend's inertia lands from it
+        self.clusteringMethod = clusteringMethod
+        self.clusteringBatchSize = clusteringBatchSize
+        self.clusteringMaxNoImprovement = clusteringMaxNoImprovement
+        self.clusteringTol = clusteringTol
+        self.compareInertia = compareInertia
+        # optional on-disk cache of feature values, so re-runs only compute the columns that changed
+        self.feature_cache = FeatureCache(featureCacheDir, featureCacheMaxBytes) if featureCacheDir else None
+        # memory-mappable model bundle (see artifacts.py); legacyPickles also keeps writing models.pkl / svm_model.pkl
+        self.artifactDir = Path(artifactDir)
+        self.legacyPickles = legacyPickles
+        # per-stage wall/CPU time, memory and item counts (see instrumentation.py); run() prints a summary and
+        # writes profileReport (JSON) / profilePrometheus (Prometheus text) when they are set
+        self.profiler = RunProfiler(traceMemory) if profile else None
+        self.profileReport = profileReport
+        self.profilePrometheus = profilePrometheus
+        # see make_classifier; whichever backend is chosen is stored as self.svm
+        self.classifier = classifier
+        self.classifierOptions = classifierOptions or {}
+        # what update() needs besides the fitted models: sample counts behind the statistics and
+        # centroids, and the references its drift checks compare a new batch against
+        self.n_docs = None
+        self.n_sents = None
+        self.tfidf_n_docs = None
+        self.cluster_counts = None
+        self.mean_cluster_distance = None
+        self.dev_accuracy = None
+        self.docs_since_refit = 0
 
-    def word_count(self, text):
-        return len(nltk.word_tokenize(text))
+    def profile_stage(self, name, items=None):
+        # context manager timing one stage when profiling is on, a no-op otherwise
+        if self.profiler is None:
+            return nullcontext({})
+        return self.profiler.stage(name, items)
 
-    def sentence_lengths(self, text):
-        # straightforward, using nltk instead of .split() to handle punctuation and edge cases
-        doc = nlp(text)
-        res = [len(nltk.word_tokenize(sent.text)) for sent in doc.sents]
-        return res
+    def tokenize_documents(self, documents):
+        # single batched spaCy pass over every document, returns the nltk word count of each
+        # sentence per document; the document word count is the sum of its sentence counts
+        disabled = [name for name in UNUSED_COMPONENTS if name in nlp.pipe_names]
+        doc_sentence_lengths = []
+        for doc in nlp.pipe(documents, batch_size=self.batchSize, n_process=self.nProcess, disable=disabled):
+            doc_sentence_lengths.append([len(nltk.word_tokenize(sent.text)) for sent in doc.sents])
+        return doc_sentence_lengths
 
-    def compute_kl_divergence(self, tfidf_vector, vocab_size):
-        tfidf_dense = tfidf_vector.toarray()[0]
-        total = tfidf_dense.sum()
-        if total > 0:
-            p = tfidf_dense / total
-        else:
-            p = np.ones(vocab_size) / vocab_size
-        q = np.ones(vocab_size) / vocab_size
-        divergence = kl_div(p, q)
-        return divergence.sum()
+    @staticmethod
+    def compute_kl_divergence_batch(tfidf_matrix, vocab_size):
+        # KL divergence of each row's normalized TFIDF weights from the uniform distribution over the
+        # vocabulary, for every row at once, straight from the CSR nonzeros: kl_div(0, q) = q over the
+        # zero entries is cancelled by sum(p) = sum(q) = 1, so only stored values contribute
+        # p * log(p / q), and an all-zero row (p = q) scores 0
+        tfidf_matrix = tfidf_matrix.tocsr()
+        n_rows = tfidf_matrix.shape[0]
+        rows = np.repeat(np.arange(n_rows), np.diff(tfidf_matrix.indptr))
+        totals = np.asarray(tfidf_matrix.sum(axis=1)).ravel()[rows]
+        p = np.divide(tfidf_matrix.data, totals, out=np.zeros(len(rows)), where=totals > 0)
+        return np.bincount(rows, weights=rel_entr(p, 1.0 / vocab_size), minlength=n_rows)
 
-    def calculate_training_statistics(self, documents):
-        doc_word_count = [self.word_count(doc) for doc in documents]
-        sentence_word_counts = []
-        for doc in documents:
-            sentence_word_counts.extend(self.sentence_lengths(doc))
+    def calculate_training_statistics(self, documents, doc_sentence_lengths=None):
+        if doc_sentence_lengths is None:
+            doc_sentence_lengths = self.tokenize_documents(documents)
+        doc_word_count = [sum(lengths) for lengths in doc_sentence_lengths]
+        sentence_word_counts = [n for lengths in doc_sentence_lengths for n in lengths]
 
+        self.n_docs = len(doc_word_count)
+        self.n_sents = len(sentence_word_counts)
         self.mean_doc_wc = np.mean(doc_word_count)
         self.std_doc_wc = np.std(doc_word_count)
         self.mean_sent_wc = np.mean(sentence_word_counts)
@@ -62,49 +164,172 @@ class AutoILR:
         self.tfidf_train = self.tfidf.fit_transform(train_docs)
         self.tfidf_dev = self.tfidf.transform(dev_docs)
         self.vocab_size = len(self.tfidf.vocabulary_)
+        self.tfidf_n_docs = len(train_docs)
+
+    def fit_reduction(self):
+        if self.reductionMethod == "pca":
+            self.pca = PCA(n_components=self.numberPCAComponents)
+            return self.pca.fit_transform(self.tfidf_train.toarray())
+        if self.reductionMethod == "svd":
+            self.pca = TruncatedSVD(n_components=self.numberPCAComponents, random_state=42)
+            return self.pca.fit_transform(self.tfidf_train)
+        if self.reductionMethod == "incremental":
+            self.pca = IncrementalPCA(n_components=self.numberPCAComponents)
+            # every partial_fit batch needs at least n_components rows, so a short tail joins the previous chunk
+            n_rows = self.tfidf_train.shape[0]
+            chunk = max(self.reductionChunkSize, self.numberPCAComponents)
+            starts = list(range(0, n_rows, chunk))
+            if len(starts) > 1 and n_rows - starts[-1] < self.numberPCAComponents:
+                starts.pop()
+            for start, end in zip(starts, starts[1:] + [n_rows]):
+                self.pca.partial_fit(self.tfidf_train[start:end].toarray())
+            return self.reduce_tfidf(self.tfidf_train)
+        raise ValueError(f"Unknown reductionMethod: {self.reductionMethod}")
+
+    def reduce_tfidf(self, tfidf_matrix):
+        # project a sparse TFIDF matrix with the fitted reducer, densifying at most reductionChunkSize rows at a time
+        if isinstance(self.pca, TruncatedSVD):
+            return self.pca.transform(tfidf_matrix)
+        chunk = self.reductionChunkSize
+        parts = [self.pca.transform(tfidf_matrix[start:start + chunk].toarray())
+                 for start in range(0, tfidf_matrix.shape[0], chunk)]
+        return np.vstack(parts) if parts else np.empty((0, self.pca.n_components_))
+
+    def fit_clustering(self, reduced):
+        if self.clusteringMethod == "kmeans":
+            self.kmeans = KMeans(n_clusters=self.numberClusters, random_state=42)
+            self.kmeans.fit(reduced)
+        elif self.clusteringMethod == "minibatch":
+            self.kmeans = MiniBatchKMeans(n_clusters=self.numberClusters, batch_size=self.clusteringBatchSize,
+                                          max_no_improvement=self.clusteringMaxNoImprovement, random_state=42)
+            self.kmeans.fit(reduced)
+        elif self.clusteringMethod == "incremental":
+            self.kmeans = MiniBatchKMeans(n_clusters=self.numberClusters, batch_size=self.clusteringBatchSize,
+                                          random_state=42, compute_labels=False)
+            # only the first partial_fit call needs at least numberClusters rows
+            chunk = max(self.clusteringBatchSize, self.numberClusters)
+            best_inertia = np.inf
+            for _ in range(MAX_CLUSTERING_PASSES):
+                for start in range(0, reduced.shape[0], chunk):
+                    self.kmeans.partial_fit(reduced[start:start + chunk])
+                inertia = -self.kmeans.score(reduced)
+                if inertia > best_inertia * (1 - self.clusteringTol):
+                    break
+                best_inertia = inertia
+        else:
+            raise ValueError(f"Unknown clusteringMethod: {self.clusteringMethod}")
+
+        self.cluster_inertia = -self.kmeans.score(reduced)
+        print(f"Cluster inertia ({self.clusteringMethod}):", self.cluster_inertia)
+        if self.compareInertia and self.clusteringMethod != "kmeans":
+            reference = KMeans(n_clusters=self.numberClusters, random_state=42).fit(reduced)
+            reference_inertia = -reference.score(reduced)
+            change = (self.cluster_inertia - reference_inertia) / reference_inertia if reference_inertia else 0.0
+            print(f"Full KMeans inertia: {reference_inertia} ({change:+.2%} change)")
+        return self.kmeans.predict(reduced)
 
     def fit_pca_kmeans(self):
-        tfidf_dense = self.tfidf_train.toarray()
-        self.pca = PCA(n_components=self.numberPCAComponents)
-        self.tfidf_pca = self.pca.fit_transform(tfidf_dense)
-        self.kmeans = KMeans(n_clusters=self.numberClusters, random_state=42)
-        self.cluster_indices = self.kmeans.fit_predict(self.tfidf_pca)
-
-    def extract_features(self, documents):
-        features = []
-        for doc in documents:
-            row = []
-            if 1 in self.desiredFeatures:
-                wc = self.word_count(doc)
-                f1 = (wc - self.mean_doc_wc) / self.std_doc_wc
-                row.append(f1)
-            if 2 in self.desiredFeatures:
-                sents = self.sentence_lengths(doc)
+        with self.profile_stage("fit_reduction", self.tfidf_train.shape[0]):
+            self.tfidf_pca = self.fit_reduction()
+        with self.profile_stage("fit_clustering", self.tfidf_pca.shape[0]):
+            self.cluster_indices = self.fit_clustering(self.tfidf_pca)
+        self.cluster_counts = np.bincount(self.cluster_indices, minlength=self.kmeans.n_clusters)
+        self.mean_cluster_distance = self.cluster_inertia / max(len(self.cluster_indices), 1)
+
+    def feature_fingerprint(self, feature):
+        # identifies everything besides the text that a feature value depends on:
+        # features 1/2 the tokenizer and training statistics, 3 the fitted TFIDF, 4 the TFIDF, reducer and centroids
+        h = hashlib.blake2b(digest_size=8)
+        h.update(str(feature).encode())
+        if feature in (1, 2):
+            h.update(repr((nlp.meta.get("name"), nlp.meta.get("version"))).encode())
+            stats = (self.mean_doc_wc, self.std_doc_wc) if feature == 1 else (self.mean_sent_wc, self.std_sent_wc)
+            h.update(repr(tuple(float(x) for x in stats)).encode())
+        else:
+            h.update(repr(sorted(self.tfidf.get_params().items(), key=lambda item: item[0])).encode())
+            h.update("\0".join(self.tfidf.get_feature_names_out()).encode("utf-8"))
+            h.update(np.ascontiguousarray(self.tfidf.idf_).tobytes())
+        if feature == 4:
+            h.update(type(self.pca).__name__.encode())
+            for name in ("components_", "mean_", "explained_variance_"):
+                if getattr(self.pca, name, None) is not None:
+                    h.update(np.ascontiguousarray(getattr(self.pca, name)).tobytes())
+            h.update(repr(getattr(self.pca, "whiten", False)).encode())
+            h.update(np.ascontiguousarray(self.kmeans.cluster_centers_).tobytes())
+        return h.hexdigest()
+
+    def compute_feature(self, feature, rows, doc_sentence_lengths=None, tfidf_matrix=None):
+        # values of one feature for the documents at the given row indices
+        if feature == 1:
+            return np.array([(sum(doc_sentence_lengths[i]) - self.mean_doc_wc) / self.std_doc_wc for i in rows])
+        if feature == 2:
+            values = []
+            for i in rows:
+                sents = doc_sentence_lengths[i]
                 z_scores = [(s - self.mean_sent_wc) / self.std_sent_wc for s in sents] if sents else [0.0]
-                f2 = np.mean(z_scores)
-                row.append(f2)
-            if 3 in self.desiredFeatures:
-                tfidf_vec = self.tfidf.transform([doc])
-                f3 = self.compute_kl_divergence(tfidf_vec, self.vocab_size)
-                row.append(f3)
-            if 4 in self.desiredFeatures:
-                tfidf_vec = self.tfidf.transform([doc])
-                tfidf_reduced = self.pca.transform(tfidf_vec.toarray())
-                f4 = self.kmeans.predict(tfidf_reduced)[0]
-                row.append(f4)
-            features.append(row)
-        return np.array(features)
+                values.append(np.mean(z_scores))
+            return np.array(values)
+        tfidf_rows = tfidf_matrix if len(rows) == tfidf_matrix.shape[0] else tfidf_matrix[rows]
+        if feature == 3:
+            return self.compute_kl_divergence_batch(tfidf_rows, self.vocab_size)
+        if feature == 4:
+            return self.kmeans.predict(self.reduce_tfidf(tfidf_rows))
+        raise ValueError(f"Unknown feature: {feature}")
+
+    def extract_features(self, documents, doc_sentence_lengths=None, tfidf_matrix=None):
+        features = [feature for feature in (1, 2, 3, 4) if feature in self.desiredFeatures]
+        n_docs = len(documents)
+        columns = {feature: np.empty(n_docs) for feature in features}
+        todo = {feature: np.arange(n_docs) for feature in features}
+        if self.feature_cache is not None:
+            with self.profile_stage("cache_lookup", n_docs):
+                keys = self.feature_cache.document_keys(documents)
+                fingerprints = {feature: self.feature_fingerprint(feature) for feature in features}
+                for feature in features:
+                    columns[feature], found = self.feature_cache.lookup(feature, fingerprints[feature], keys)
+                    todo[feature] = np.flatnonzero(~found)
+
+        # only parse / transform the documents that some feature is still missing
+        text_rows = np.union1d(todo.get(1, []), todo.get(2, [])).astype(int)
+        if doc_sentence_lengths is None and len(text_rows):
+            doc_sentence_lengths = [None] * n_docs
+            with self.profile_stage("tokenize", len(text_rows)):
+                for i, lengths in zip(text_rows, self.tokenize_documents([documents[i] for i in text_rows])):
+                    doc_sentence_lengths[i] = lengths
+        tfidf_rows = np.union1d(todo.get(3, []), todo.get(4, [])).astype(int)
+        if tfidf_matrix is None and len(tfidf_rows):
+            # empty strings transform to empty rows for free, which keeps row indices aligned with documents
+            needed = np.zeros(n_docs, dtype=bool)
+            needed[tfidf_rows] = True
+            with self.profile_stage("tfidf_transform", len(tfidf_rows)):
+                tfidf_matrix = self.tfidf.transform([doc if needed[i] else "" for i, doc in enumerate(documents)])
+
+        for feature in features:
+            rows = todo[feature]
+            if not len(rows):
+                continue
+            with self.profile_stage(f"feature_{feature}", len(rows)):
+                values = self.compute_feature(feature, rows, doc_sentence_lengths, tfidf_matrix)
+            columns[feature][rows] = values
+            if self.feature_cache is not None:
+                self.feature_cache.store(feature, fingerprints[feature], keys[rows], values)
+
+        if not features:
+            return np.empty((n_docs, 0))
+        return np.column_stack([columns[feature] for feature in features])
 
     def train_svm(self, X_train, y_train):
-        self.svm = SVC()
+        self.svm = make_classifier(self.classifier, **self.classifierOptions)
         self.svm.fit(X_train, y_train)
-        with open("svm_model.pkl", "wb") as f:
-            pickle.dump(self.svm, f)
+        if self.legacyPickles:
+            with open("svm_model.pkl", "wb") as f:
+                pickle.dump(self.svm, f)
 
     def evaluate_model(self, X_dev, y_dev):
         y_pred = self.svm.predict(X_dev)
         acc = (y_pred == y_dev).mean()
         print(f"Dev Accuracy: {acc:.3f}")
+        return acc
 
     def load_documents(self, filepath):
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -118,34 +343,257 @@ class AutoILR:
         return documents, labels
 
     def run(self):
-        train_docs, train_labels = self.load_documents(self.trainingPath)
-        dev_docs, dev_labels = self.load_documents(self.devPath)
-
-        self.calculate_training_statistics(train_docs)
-        self.fit_tfidf(train_docs, dev_docs)
-        self.fit_pca_kmeans()
-
-        label_encoder = LabelEncoder()
-        y_train = label_encoder.fit_transform(train_labels)
-        y_dev = label_encoder.transform(dev_labels)
-
-        X_train = self.extract_features(train_docs)
-        X_dev = self.extract_features(dev_docs)
-
-        self.train_svm(X_train, y_train)
-        self.evaluate_model(X_dev, y_dev)
-
-        # Save other models
-        with open("models.pkl", "wb") as f:
-            pickle.dump({
-                'tfidf': self.tfidf,
-                'pca': self.pca,
-                'kmeans': self.kmeans,
-                'mean_doc_wc': self.mean_doc_wc,
-                'std_doc_wc': self.std_doc_wc,
-                'mean_sent_wc': self.mean_sent_wc,
-                'std_sent_wc': self.std_sent_wc,
-            }, f)
+        with self.profile_stage("run"):
+            with self.profile_stage("load_documents") as stage:
+                train_docs, train_labels = self.load_documents(self.trainingPath)
+                dev_docs, dev_labels = self.load_documents(self.devPath)
+                stage["items"] = len(train_docs) + len(dev_docs)
+
+            # parse the training set once, the sentence lengths feed both the statistics and features 1/2
+            with self.profile_stage("tokenize", len(train_docs)):
+                train_sentence_lengths = self.tokenize_documents(train_docs)
+            with self.profile_stage("training_statistics", len(train_docs)):
+                self.calculate_training_statistics(train_docs, train_sentence_lengths)
+            with self.profile_stage("fit_tfidf", len(train_docs) + len(dev_docs)):
+                self.fit_tfidf(train_docs, dev_docs)
+            self.fit_pca_kmeans()
+
+            self.label_encoder = LabelEncoder()
+            y_train = self.label_encoder.fit_transform(train_labels)
+            y_dev = self.label_encoder.transform(dev_labels)
+
+            with self.profile_stage("extract_features_train", len(train_docs)):
+                X_train = self.extract_features(train_docs, train_sentence_lengths, self.tfidf_train)
+            with self.profile_stage("extract_features_dev", len(dev_docs)):
+                X_dev = self.extract_features(dev_docs, tfidf_matrix=self.tfidf_dev)
+
+            with self.profile_stage("train_svm", len(train_docs)):
+                self.train_svm(X_train, y_train)
+            with self.profile_stage("evaluate_model", len(dev_docs)):
+                self.dev_accuracy = self.evaluate_model(X_dev, y_dev)
+            self.docs_since_refit = 0
+
+            with self.profile_stage("save_models"):
+                self.save_models()
+
+        if self.profiler is not None:
+            self.write_profile()
+
+    def write_profile(self):
+        print(self.profiler.format_table())
+        if self.profileReport:
+            self.profiler.write_json(self.profileReport, config={
+                'desired_features': list(self.desiredFeatures),
+                'number_pca_components': self.numberPCAComponents,
+                'number_clusters': self.numberClusters,
+                'reduction_method': self.reductionMethod,
+                'clustering_method': self.clusteringMethod,
+                'classifier': self.classifier,
+                'batch_size': self.batchSize,
+                'n_process': self.nProcess,
+            })
+            print(f"Run report written to {self.profileReport}")
+        if self.profilePrometheus:
+            self.profiler.write_prometheus(self.profilePrometheus)
+
+    def training_stats(self):
+        stats = {
+            'mean_doc_wc': self.mean_doc_wc,
+            'std_doc_wc': self.std_doc_wc,
+            'mean_sent_wc': self.mean_sent_wc,
+            'std_sent_wc': self.std_sent_wc,
+        }
+        # sample counts for update(), missing from models trained before it existed
+        for key in ('n_docs', 'n_sents', 'tfidf_n_docs', 'mean_cluster_distance'):
+            if getattr(self, key, None) is not None:
+                stats[key] = getattr(self, key)
+        return stats
+
+    def save_models(self):
+        save_artifacts(self.artifactDir, self.tfidf, self.pca, self.kmeans, self.svm, self.training_stats(),
+                       label_classes=self.label_encoder.classes_,
+                       extra={
+                           'desired_features': list(self.desiredFeatures),
+                           'reduction_method': self.reductionMethod,
+                           'reduction_chunk_size': self.reductionChunkSize,
+                           'clustering_method': self.clusteringMethod,
+                           'classifier': self.classifier,
+                           'cluster_counts': [int(n) for n in self.cluster_counts]
+                           if self.cluster_counts is not None else None,
+                           'dev_accuracy': float(self.dev_accuracy) if self.dev_accuracy is not None else None,
+                           'docs_since_refit': self.docs_since_refit,
+                       })
+        if self.legacyPickles:
+            # Save other models
+            with open("models.pkl", "wb") as f:
+                pickle.dump({
+                    'tfidf': self.tfidf,
+                    'pca': self.pca,
+                    'reduction_method': self.reductionMethod,
+                    'kmeans': self.kmeans,
+                    'clustering_method': self.clusteringMethod,
+                    **self.training_stats(),
+                }, f)
+
+    def load_models(self, artifactDir=None, mmap_mode="r"):
+        # restore a trained model from its artifact bundle, ready for extract_features / svm.predict
+        models = load_artifacts(artifactDir or self.artifactDir, mmap_mode=mmap_mode)
+        self.tfidf = models['tfidf']
+        self.vocab_size = len(self.tfidf.vocabulary_)
+        self.pca = models['pca']
+        self.kmeans = models['kmeans']
+        self.svm = models['svm']
+        self.mean_doc_wc = models['mean_doc_wc']
+        self.std_doc_wc = models['std_doc_wc']
+        self.mean_sent_wc = models['mean_sent_wc']
+        self.std_sent_wc = models['std_sent_wc']
+        for key in ('n_docs', 'n_sents', 'tfidf_n_docs'):
+            setattr(self, key, int(models[key]) if key in models else None)
+        self.mean_cluster_distance = models.get('mean_cluster_distance')
+        self.label_encoder = LabelEncoder()
+        self.label_encoder.classes_ = np.array(models['label_classes'])
+        extra = models['extra']
+        self.desiredFeatures = extra.get('desired_features', self.desiredFeatures)
+        self.reductionMethod = extra.get('reduction_method', self.reductionMethod)
+        self.reductionChunkSize = extra.get('reduction_chunk_size', self.reductionChunkSize)
+        self.clusteringMethod = extra.get('clustering_method', self.clusteringMethod)
+        self.classifier = extra.get('classifier', "svc")
+        self.cluster_counts = np.array(extra['cluster_counts']) if extra.get('cluster_counts') is not None else None
+        self.dev_accuracy = extra.get('dev_accuracy')
+        self.docs_since_refit = extra.get('docs_since_refit', 0)
+        return models
+
+    def update(self, new_path, dev_path=None, vocabulary="fixed", min_df=2, max_new_terms=1000, epochs=1,
+               drift_thresholds=None, save=True):
+        """Fold the labeled documents in new_path into a model restored with load_models.
+
+        Only the new documents are read. The word count statistics are merged with
+        them, the centroids move to take in their new members and the classifier
+        takes partial_fit steps on them (needs classifier="sgd"); the reducer stays
+        as fitted. The TFIDF vocabulary either stays fixed or, with vocabulary="grow",
+        gains up to max_new_terms unseen terms found in at least min_df new documents,
+        with every IDF recomputed. Arrays memory-mapped from the bundle (load_models'
+        default mmap_mode="r") are first copied into memory, the updated ones are
+        only written back by save_models. Returns a report of the drift checks (see
+        incremental.DRIFT_THRESHOLDS); any flagged check means a full run() is due.
+        """
+        thresholds = {**DRIFT_THRESHOLDS, **(drift_thresholds or {})}
+        transform, estimator = incremental_estimator(self.svm)
+        if estimator is None:
+            raise ValueError(f"The {self.classifier} classifier cannot be updated incrementally, "
+                             f"train with classifier='sgd' or run a full refit")
+        required = (self.n_docs, self.n_sents, self.tfidf_n_docs, self.cluster_counts, self.mean_cluster_distance)
+        if any(value is None for value in required):
+            raise ValueError("The model was saved without the sample counts update() needs, run a full refit")
+        if vocabulary not in ("fixed", "grow"):
+            raise ValueError(f"Unknown vocabulary mode: {vocabulary}")
+        for fitted in (self.tfidf, self.pca, self.kmeans, self.svm):
+            own_arrays(fitted)
+
+        start = time.perf_counter()
+        documents, labels = self.load_documents(new_path)
+        if not documents:
+            return {"new_docs": 0, "drift": [], "refit_recommended": False}
+        try:
+            y = self.label_encoder.transform(labels)
+        except ValueError as error:
+            raise ValueError(f"{new_path} has labels the model was not trained on, run a full refit ({error})")
+        report = {"new_docs": len(documents)}
+
+        # score the batch with the model as it was before seeing it
+        sentence_lengths = self.tokenize_documents(documents)
+        tfidf_matrix = self.tfidf.transform(documents)
+        X = self.extract_features(documents, sentence_lengths, tfidf_matrix)
+        report["batch_accuracy"] = float((self.svm.predict(X) == y).mean())
+
+        doc_wc = [sum(lengths) for lengths in sentence_lengths]
+        sent_wc = [n for lengths in sentence_lengths for n in lengths]
+        report["doc_length_shift"] = float(abs(np.mean(doc_wc) - self.mean_doc_wc) / self.std_doc_wc) \
+            if self.std_doc_wc else 0.0
+        report["sentence_length_shift"] = float(abs(np.mean(sent_wc) - self.mean_sent_wc) / self.std_sent_wc) \
+            if sent_wc and self.std_sent_wc else 0.0
+        self.n_docs, self.mean_doc_wc, self.std_doc_wc = merge_moments(
+            self.n_docs, self.mean_doc_wc, self.std_doc_wc, doc_wc)
+        self.n_sents, self.mean_sent_wc, self.std_sent_wc = merge_moments(
+            self.n_sents, self.mean_sent_wc, self.std_sent_wc, sent_wc)
+
+        df, token_counts = document_frequencies(self.tfidf.build_analyzer(), documents)
+        n_tokens = sum(token_counts.values())
+        oov = sum(count for term, count in token_counts.items() if term not in self.tfidf.vocabulary_)
+        report["oov_rate"] = oov / n_tokens if n_tokens else 0.0
+        report["new_terms"] = 0
+        if vocabulary == "grow":
+            report["new_terms"] = self.grow_vocabulary(df, len(documents), min_df, max_new_terms)
+            tfidf_matrix = self.tfidf.transform(documents)
+
+        # assign with the current centroids, then move each centroid to the mean of all its members
+        reduced = self.reduce_tfidf(tfidf_matrix)
+        centers = np.asarray(self.kmeans.cluster_centers_)
+        assigned = self.kmeans.predict(reduced)
+        distances = ((reduced - centers[assigned]) ** 2).sum(axis=1)
+        report["cluster_distance_ratio"] = float(distances.mean() / self.mean_cluster_distance) \
+            if self.mean_cluster_distance else 0.0
+        n_clustered = self.cluster_counts.sum()
+        self.mean_cluster_distance = ((self.mean_cluster_distance * n_clustered + distances.sum())
+                                      / (n_clustered + len(distances)))
+        self.kmeans.cluster_centers_, self.cluster_counts = update_centroids(centers, self.cluster_counts, reduced,
+                                                                             assigned)
+
+        # features under the updated statistics / centroids, the scaler and kernel map stay fixed
+        X = self.extract_features(documents, sentence_lengths, tfidf_matrix)
+        X_step = transform(X) if transform is not None else X
+        for _ in range(epochs):
+            estimator.partial_fit(X_step, y, classes=estimator.classes_)
+        self.docs_since_refit += len(documents)
+        report["delta_fraction"] = self.docs_since_refit / max(self.n_docs - self.docs_since_refit, 1)
+
+        if dev_path is not None:
+            dev_docs, dev_labels = self.load_documents(dev_path)
+            report["dev_accuracy"] = float(self.evaluate_model(self.extract_features(dev_docs),
+                                                               self.label_encoder.transform(dev_labels)))
+
+        checks = [("doc_length_shift", "length_shift"), ("sentence_length_shift", "length_shift"),
+                  ("oov_rate", "oov_rate"), ("cluster_distance_ratio", "cluster_distance_ratio"),
+                  ("delta_fraction", "delta_fraction")]
+        drift = [name for name, key in checks if report[name] > thresholds[key]]
+        if self.dev_accuracy is not None:
+            drift += [name for name in ("batch_accuracy", "dev_accuracy")
+                      if name in report and self.dev_accuracy - report[name] > thresholds["accuracy_drop"]]
+        report["drift"] = drift
+        report["refit_recommended"] = bool(drift)
+        report["seconds"] = time.perf_counter() - start
+
+        print(f"Updated with {len(documents)} documents in {report['seconds']:.1f}s "
+              f"(batch accuracy before update {report['batch_accuracy']:.3f}, {report['new_terms']} new terms)")
+        for name in drift:
+            print(f"⚠️ Drift: {name} = {report[name]:.3f}")
+        if drift:
+            print("⚠️ Drift past the thresholds, a full refit is recommended")
+        if save:
+            self.save_models()
+        return report
+
+    def grow_vocabulary(self, df, n_new_docs, min_df, max_new_terms):
+        # add the most common unseen terms of the new documents and recompute every IDF with them counted in;
+        # the reducer gets zero weights for the new columns, so existing projections do not move
+        vocabulary = dict(self.tfidf.vocabulary_)
+        new_terms = sorted((term for term, n in df.items() if n >= min_df and term not in vocabulary),
+                           key=lambda term: (-df[term], term))[:max_new_terms]
+        for term in new_terms:
+            vocabulary[term] = len(vocabulary)
+        if self.tfidf.use_idf:
+            doc_freq = np.concatenate([recover_document_frequencies(self.tfidf, self.tfidf_n_docs),
+                                       np.zeros(len(new_terms))])
+            for term, n in df.items():
+                if term in vocabulary:
+                    doc_freq[vocabulary[term]] += n
+        self.tfidf_n_docs += n_new_docs
+        self.tfidf.vocabulary_ = vocabulary
+        if self.tfidf.use_idf:
+            self.tfidf.idf_ = compute_idf(self.tfidf, doc_freq, self.tfidf_n_docs)
+        self.vocab_size = len(vocabulary)
+        pad_reducer(self.pca, self.vocab_size)
+        return len(new_terms)
 
 if __name__ == "__main__":
     model = AutoILR()
@@ -0,0 +1,94 @@
+import json
+import time
+import pickle
+import argparse
+
+import numpy as np
+from sklearn.metrics import f1_score
+
+from baseline_class import AutoILR, CLASSIFIERS, make_classifier
+from sweep import parse_features, prepare_shared, fit_cluster_feature
+
+# Accuracy and fit / predict cost of every classifier backend on the same feature matrices.
+# Features are extracted once; each backend is then fit on growing slices of the training
+# set, so the report also shows how fit time scales (kernel SVC superlinearly, the rest ~linearly).
+
+def time_predict(classifier, X, rows):
+    # tile X up to `rows` rows so prediction throughput is measured on a meaningful batch
+    X_batch = np.resize(X, (max(rows, X.shape[0]), X.shape[1]))
+    start = time.perf_counter()
+    classifier.predict(X_batch)
+    return (time.perf_counter() - start) / X_batch.shape[0]
+
+def compare(X_train, y_train, X_dev, y_dev, classifiers, fractions, predict_rows, seed=42):
+    order = np.random.default_rng(seed).permutation(X_train.shape[0])
+    results = []
+    for fraction in fractions:
+        rows = order[:max(1, int(round(fraction * len(order))))]
+        for name in classifiers:
+            classifier = make_classifier(name)
+            start = time.perf_counter()
+            classifier.fit(X_train[rows], y_train[rows])
+            fit_seconds = time.perf_counter() - start
+            y_pred = classifier.predict(X_dev)
+            result = {
+                "classifier": name,
+                "train_rows": len(rows),
+                "fit_seconds": fit_seconds,
+                "predict_us_per_doc": time_predict(classifier, X_dev, predict_rows) * 1e6,
+                "accuracy": float((y_pred == y_dev).mean()),
+                "macro_f1": float(f1_score(y_dev, y_pred, average="macro")),
+                "model_bytes": len(pickle.dumps(classifier, protocol=pickle.HIGHEST_PROTOCOL)),
+            }
+            if hasattr(classifier, "n_support_"):
+                result["support_vectors"] = int(classifier.n_support_.sum())
+            results.append(result)
+            print(f"{name} on {len(rows):,} rows: accuracy {result['accuracy']:.3f}, fit {fit_seconds:.2f}s")
+    return results
+
+def format_report(results, baseline="svc"):
+    reference = {r["train_rows"]: r for r in results if r["classifier"] == baseline}
+    lines = [f"{'Classifier':<14}{'Rows':>9}{'Fit s':>9}{'Fit x':>8}{'Pred us':>9}{'Pred x':>8}"
+             f"{'Accuracy':>10}{'Δ acc':>8}{'Macro F1':>10}{'Size KB':>9}"]
+    for r in results:
+        base = reference.get(r["train_rows"])
+        fit_speedup = f"{base['fit_seconds'] / r['fit_seconds']:.1f}" if base and r["fit_seconds"] > 0 else "-"
+        predict_speedup = (f"{base['predict_us_per_doc'] / r['predict_us_per_doc']:.1f}"
+                           if base and r["predict_us_per_doc"] > 0 else "-")
+        delta = f"{r['accuracy'] - base['accuracy']:+.3f}" if base else "-"
+        lines.append(f"{r['classifier']:<14}{r['train_rows']:>9,}{r['fit_seconds']:>9.2f}{fit_speedup:>8}"
+                     f"{r['predict_us_per_doc']:>9.1f}{predict_speedup:>8}{r['accuracy']:>10.3f}{delta:>8}"
+                     f"{r['macro_f1']:>10.3f}{r['model_bytes'] / 1024:>9.0f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare AutoILR classifier backends against the kernel SVC")
+    parser.add_argument("--training-path", default="trainEnglish.json")
+    parser.add_argument("--dev-path", default="devEnglish.json")
+    parser.add_argument("--features", type=parse_features, default=(1, 2, 3, 4))
+    parser.add_argument("--pca-components", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=300)
+    parser.add_argument("--classifiers", nargs="+", choices=CLASSIFIERS, default=CLASSIFIERS)
+    parser.add_argument("--train-fractions", nargs="+", type=float, default=[1.0],
+                        help="fit on these fractions of the training set too, e.g. 0.25 0.5 1.0")
+    parser.add_argument("--predict-rows", type=int, default=10000, help="batch size for the predict timing")
+    parser.add_argument("--batch-size", type=int, default=256, help="spaCy batch size")
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--output", default="classifier_comparison.json")
+    args = parser.parse_args()
+
+    model = AutoILR(trainingPath=args.training_path, devPath=args.dev_path, batchSize=args.batch_size,
+                    nProcess=args.n_process, legacyPickles=False)
+    shared = prepare_shared(model, [args.features])
+    columns = shared["columns"]
+    if 4 in args.features:
+        fit_cluster_feature(model, columns, args.pca_components, args.clusters)
+    X_train = np.column_stack([columns["train"][feature] for feature in args.features])
+    X_dev = np.column_stack([columns["dev"][feature] for feature in args.features])
+
+    results = compare(X_train, shared["y_train"], X_dev, shared["y_dev"], args.classifiers,
+                      sorted(args.train_fractions), args.predict_rows)
+    print(format_report(results))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": results}, f, indent=2)
+    print(f"Comparison written to {args.output}")
@@ -1,48 +1,207 @@
+import os
+import sys
+import glob
+import gzip
 import json
-import random
-import nltk
+import time
+import hashlib
+import argparse
 import spacy
 from pathlib import Path
 
-nltk.download("punkt")
-nlp = spacy.load("en_core_web_sm")
+# Splits the rated corpus (one {"text", "label"} JSON object per line) into train/dev/test files
+# with each document's text cut into sentences.
+#
+# A document's split is decided by a salted hash of its text, not a random draw: the same corpus
+# and salt always give the same splits, duplicate texts land in the same split, and shards of the
+# input can be processed independently (--shard-index / --num-shards, on separate machines if need
+# be) and merged afterwards (--merge) without a document ever changing sides.
 
-# Path to your original file
-raw_path = Path("english.json")
+SPLITS = ["train", "dev", "test"]
+DEFAULT_NAMES = ["trainEnglish.json", "devEnglish.json", "testEnglish.json"]
+DEFAULT_RATIOS = [0.8, 0.1, 0.1]
+DEFAULT_SALT = "autoilr"
 
-# Output files
-train_file = open("trainEnglish.json", "w", encoding="utf-8")
-dev_file = open("devEnglish.json", "w", encoding="utf-8")
-test_file = open("testEnglish.json", "w", encoding="utf-8")
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Documents between progress lines
+PROGRESS_EVERY = 10000
 
 def clean_label(label_str):
     # Converts "ILR3" -> 3 (or handle however your labels are formatted)
     return int("".join([c for c in label_str if c.isdigit()]))
 
-with open(raw_path, "r", encoding="utf-8") as f:
-    for line in f:
-        obj = json.loads(line)
-        text = obj.get("text", "")
-        doc = nlp(text)
-        sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
-        label = clean_label(obj.get("label", "ILR0"))
-        example = {
-            "text": sentences,
-            "label": label
-        }
-        u = random.random()
-        if u < 0.8:
-            json.dump(example, train_file)
-            train_file.write("\n")
-        elif u < 0.9:
-            json.dump(example, dev_file)
-            dev_file.write("\n")
-        else:
-            json.dump(example, test_file)
-            test_file.write("\n")
-
-train_file.close()
-dev_file.close()
-test_file.close()
-
-print("✅ Done splitting and cleaning data!")
+def assign_split(text, salt=DEFAULT_SALT, ratios=DEFAULT_RATIOS):
+    """Index into SPLITS for a document, from a salted hash of its text"""
+    digest = hashlib.blake2b(f"{salt}\0{text}".encode("utf-8"), digest_size=8).digest()
+    u = int.from_bytes(digest, "big") / 2 ** 64
+    total = sum(ratios)
+    cumulative = 0.0
+    for index, ratio in enumerate(ratios):
+        cumulative += ratio / total
+        if u < cumulative:
+            return index
+    return len(ratios) - 1
+
+def in_shard(text, shard_index, num_shards):
+    # a second, unsalted hash so the shards stay the same whatever salt the splits use
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8, person=b"shard").digest()
+    return int.from_bytes(digest, "big") % num_shards == shard_index
+
+def load_segmenter(model="en_core_web_sm", segmenter="senter"):
+    """A spaCy pipeline that only does what doc.sents needs.
+
+    "senter" runs the model's small statistical sentence recognizer alone (disabled
+    by default in the en_core_web models), "parser" the dependency parser and the
+    tok2vec layer it listens to, "rule" a punctuation-based sentencizer without
+    loading a model at all.
+    """
+    if segmenter == "rule":
+        nlp = spacy.blank("en")
+        nlp.add_pipe("sentencizer")
+        return nlp
+    nlp = spacy.load(model)
+    if segmenter == "senter":
+        if "senter" not in nlp.component_names:
+            raise ValueError(f"{model} has no senter component, use --segmenter parser or rule")
+        nlp.enable_pipe("senter")
+        nlp.select_pipes(enable=["senter"])
+    elif segmenter == "parser":
+        nlp.select_pipes(enable=[name for name in ("tok2vec", "parser") if name in nlp.component_names])
+    else:
+        raise ValueError(f"Unknown segmenter: {segmenter}")
+    return nlp
+
+def read_documents(paths, shard_index=0, num_shards=1):
+    # (text, label) for every document in the input files, in order, restricted to one shard
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                text = obj.get("text", "")
+                if num_shards > 1 and not in_shard(text, shard_index, num_shards):
+                    continue
+                yield text, clean_label(obj.get("label", "ILR0"))
+
+def open_output(path, compress=False):
+    # buffered text writer, gzip when compress; written to path + ".tmp" and moved into place on close
+    tmp_path = f"{path}.tmp"
+    if compress:
+        return tmp_path, gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6)
+    return tmp_path, open(tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+
+def output_paths(output_dir, names, compress=False, shard_index=None, num_shards=1):
+    paths = []
+    for name in names:
+        if num_shards > 1 and shard_index is not None:
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}-{shard_index:05d}-of-{num_shards:05d}{ext}"
+        paths.append(os.path.join(output_dir, name + (".gz" if compress else "")))
+    return paths
+
+def split_documents(nlp, documents, paths, salt=DEFAULT_SALT, ratios=DEFAULT_RATIOS, batch_size=256,
+                    n_process=1, compress=False, join_sentences=False):
+    """Segment the documents and write each to its split, returns the count per split"""
+    os.makedirs(os.path.dirname(os.path.abspath(paths[0])), exist_ok=True)
+    outputs = [open_output(path, compress) for path in paths]
+    counts = [0] * len(paths)
+    start = time.perf_counter()
+    try:
+        # nlp.pipe keeps the input order with any n_process, so the output files are reproducible
+        contexts = ((text, (label, assign_split(text, salt, ratios))) for text, label in documents)
+        for n, (doc, (label, split)) in enumerate(nlp.pipe(contexts, as_tuples=True, batch_size=batch_size,
+                                                           n_process=n_process), 1):
+            sentences = [sent.text.strip() for sent in doc.sents if sent.text.strip()]
+            example = {
+                "text": " ".join(sentences) if join_sentences else sentences,
+                "label": label
+            }
+            outputs[split][1].write(json.dumps(example) + "\n")
+            counts[split] += 1
+            if n % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{n:,} documents ({n / elapsed:,.0f}/s)")
+    except BaseException:
+        for tmp_path, f in outputs:
+            f.close()
+            os.remove(tmp_path)
+        raise
+    for (tmp_path, f), path in zip(outputs, paths):
+        f.close()
+        os.replace(tmp_path, path)
+    return counts
+
+def merge_shards(output_dir, names, compress=False):
+    """Concatenate the shard outputs of every split, in shard order, into the unsharded files"""
+    counts = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        suffix = ".gz" if compress else ""
+        pattern = f"{glob.escape(stem)}-*-of-*{ext}{suffix}"
+        shards = sorted(glob.glob(os.path.join(glob.escape(output_dir), pattern)))
+        if not shards:
+            raise FileNotFoundError(f"No shards of {name} in {output_dir}")
+        totals = {shard.rsplit("-of-", 1)[1] for shard in shards}
+        expected = int(totals.pop().split(".")[0]) if len(totals) == 1 else None
+        if expected != len(shards):
+            raise ValueError(f"Found {len(shards)} shards of {name}, expected {expected or 'one shard count'}")
+        path = os.path.join(output_dir, name + suffix)
+        tmp_path = f"{path}.tmp"
+        # gzip members concatenate into a valid gzip stream, so both cases are a byte copy
+        with open(tmp_path, "wb") as out:
+            for shard in shards:
+                with open(shard, "rb") as f:
+                    while chunk := f.read(WRITE_BUFFER_SIZE):
+                        out.write(chunk)
+        with (gzip.open(tmp_path, "rb") if compress else open(tmp_path, "rb")) as f:
+            n = sum(1 for _ in f)
+        os.replace(tmp_path, path)
+        counts.append(n)
+    return counts
+
+def report(names, counts, elapsed=None):
+    total = sum(counts)
+    for name, count in zip(names, counts):
+        print(f"  {name}: {count:,} ({count / total if total else 0:.1%})")
+    if elapsed is not None:
+        print(f"{total:,} documents in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f}/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the rated corpus into sentence-segmented train/dev/test files")
+    parser.add_argument("inputs", nargs="*", default=["english.json"], help="JSONL files with text and label")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--names", nargs=3, default=DEFAULT_NAMES, metavar=("TRAIN", "DEV", "TEST"))
+    parser.add_argument("--ratios", nargs=3, type=float, default=DEFAULT_RATIOS, metavar=("TRAIN", "DEV", "TEST"))
+    parser.add_argument("--salt", default=DEFAULT_SALT, help="change it to draw a different (still fixed) split")
+    parser.add_argument("--model", default="en_core_web_sm")
+    parser.add_argument("--segmenter", choices=["senter", "parser", "rule"], default="senter")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy worker processes")
+    parser.add_argument("--gzip", action="store_true", help="write .gz files")
+    parser.add_argument("--join-sentences", action="store_true",
+                        help="write text as one string of the segmented sentences instead of a list "
+                             "(the format AutoILR.load_documents reads)")
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument("--num-shards", type=int, default=1,
+                        help="process only the documents hashed to --shard-index, writing *-IIIII-of-NNNNN files")
+    parser.add_argument("--merge", action="store_true", help="merge the shard files in --output-dir and exit")
+    args = parser.parse_args()
+
+    if args.merge:
+        counts = merge_shards(args.output_dir, args.names, args.gzip)
+        print("✅ Merged shards:")
+        report(args.names, counts)
+        sys.exit(0)
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard-index must be between 0 and --num-shards - 1")
+
+    nlp = load_segmenter(args.model, args.segmenter)
+    paths = output_paths(args.output_dir, args.names, args.gzip, args.shard_index, args.num_shards)
+    start = time.perf_counter()
+    counts = split_documents(nlp, read_documents([Path(p) for p in args.inputs], args.shard_index, args.num_shards),
+                             paths, args.salt, args.ratios, args.batch_size, args.n_process, args.gzip,
+                             args.join_sentences)
+    print("✅ Done splitting and cleaning data!")
+    report([os.path.basename(path) for path in paths], counts, time.perf_counter() - start)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+
+class FeatureCache:
+    """Persistent per-document feature values, stored as columnar .npz shards.
+
+    Every value is keyed by a hash of the document text and filed under
+    (feature, fingerprint), where the fingerprint identifies the statistics or
+    fitted models the feature was computed from. A shard holds two columns,
+    the document keys and the feature values. Once the directory grows past
+    max_bytes, the least recently used shards are deleted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def document_keys(documents):
+        # 16-byte content hash per document, a fixed-width bytes column sorts and compares fast in numpy
+        return np.array([hashlib.blake2b(doc.encode("utf-8"), digest_size=16).digest() for doc in documents],
+                        dtype="S16")
+
+    def _shards(self, feature, fingerprint):
+        return sorted(self.cache_dir.glob(f"f{feature}-{fingerprint}-*.npz"))
+
+    def lookup(self, feature, fingerprint, keys):
+        # returns (values, found); values is NaN wherever found is False
+        values = np.full(len(keys), np.nan)
+        found = np.zeros(len(keys), dtype=bool)
+        shard_keys, shard_values = [], []
+        for shard in self._shards(feature, fingerprint):
+            try:
+                with np.load(shard) as data:
+                    shard_keys.append(data["keys"])
+                    shard_values.append(data["values"])
+                # reads count as use for eviction
+                os.utime(shard)
+            except (OSError, ValueError, KeyError):
+                # a shard evicted or truncated under us is just a miss
+                continue
+        if not shard_keys or not len(keys):
+            return values, found
+
+        cached_keys = np.concatenate(shard_keys)
+        cached_values = np.concatenate(shard_values)
+        order = np.argsort(cached_keys, kind="stable")
+        cached_keys, cached_values = cached_keys[order], cached_values[order]
+        positions = np.minimum(np.searchsorted(cached_keys, keys), len(cached_keys) - 1)
+        found = cached_keys[positions] == keys
+        values[found] = cached_values[positions[found]]
+        return values, found
+
+    def store(self, feature, fingerprint, keys, values):
+        if not len(keys):
+            return
+        name = f"f{feature}-{fingerprint}-{uuid.uuid4().hex}.npz"
+        tmp_path = self.cache_dir / (name + ".tmp")
+        # write through a temp name so readers never see a half-written shard
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, keys=np.asarray(keys, dtype="S16"), values=np.asarray(values, dtype=np.float64))
+        os.replace(tmp_path, self.cache_dir / name)
+        self.evict()
+
+    def evict(self):
+        shards = []
+        for shard in self.cache_dir.glob("*.npz"):
+            try:
+                stat = shard.stat()
+            except OSError:
+                continue
+            shards.append((stat.st_mtime, stat.st_size, shard))
+        total = sum(size for _, size, _ in shards)
+        for _, size, shard in sorted(shards, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                shard.unlink()
+            except OSError:
+                pass
+            total -= size
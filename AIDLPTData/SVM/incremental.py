@@ -0,0 +1,128 @@
+from collections import Counter
+
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.pipeline import Pipeline
+
+# Building blocks for AutoILR.update: folding a batch of new documents into a trained model
+# without revisiting the documents it was trained on.
+
+# when AutoILR.update flags a batch as drifted (and a full refit as worthwhile)
+DRIFT_THRESHOLDS = {
+    # |batch mean - running mean| of the document / sentence word counts, in running standard deviations
+    "length_shift": 0.5,
+    # share of the batch's tokens missing from the TFIDF vocabulary
+    "oov_rate": 0.1,
+    # batch mean squared distance to the nearest centroid over the training mean
+    "cluster_distance_ratio": 1.5,
+    # accuracy on the batch (scored before training on it) below the accuracy at the last full refit
+    "accuracy_drop": 0.1,
+    # documents added since the last full refit, as a fraction of the documents that refit saw
+    "delta_fraction": 0.5,
+}
+
+
+def merge_moments(n, mean, std, values):
+    """Fold values into a running (count, mean, population std), Chan et al.'s parallel update"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return n, mean, std
+    n_b = len(values)
+    mean_b = values.mean()
+    m2 = std ** 2 * n + ((values - mean_b) ** 2).sum()
+    total = n + n_b
+    delta = mean_b - mean
+    m2 += delta ** 2 * n * n_b / total
+    return total, mean + delta * n_b / total, np.sqrt(m2 / total)
+
+
+def document_frequencies(analyzer, documents):
+    # term -> number of documents containing it and term -> occurrences, in one analyzer pass
+    df = Counter()
+    token_counts = Counter()
+    for doc in documents:
+        tokens = analyzer(doc)
+        token_counts.update(tokens)
+        df.update(set(tokens))
+    return df, token_counts
+
+
+def recover_document_frequencies(tfidf, n_docs):
+    # invert TfidfTransformer's idf formula, the fitted vectorizer does not keep the raw counts
+    idf = np.asarray(tfidf.idf_, dtype=np.float64)
+    if tfidf.smooth_idf:
+        return np.rint((1 + n_docs) * np.exp(1 - idf) - 1)
+    return np.rint(n_docs * np.exp(1 - idf))
+
+
+def compute_idf(tfidf, df, n_docs):
+    if tfidf.smooth_idf:
+        return np.log((1 + n_docs) / (1 + df)) + 1
+    return np.log(n_docs / df) + 1
+
+
+def pad_reducer(reducer, n_features):
+    # give the reducer zero weights for newly added vocabulary columns, the projection of the
+    # existing columns stays exactly as fitted
+    extra = n_features - reducer.components_.shape[1]
+    if extra <= 0:
+        return
+    reducer.components_ = np.hstack([reducer.components_, np.zeros((reducer.components_.shape[0], extra))])
+    for name in ("mean_", "var_"):
+        if getattr(reducer, name, None) is not None:
+            setattr(reducer, name, np.concatenate([getattr(reducer, name), np.zeros(extra)]))
+    reducer.n_features_in_ = n_features
+
+
+def update_centroids(centers, counts, reduced, labels):
+    """MacQueen's running-mean update of the centroids for a batch assigned to them.
+
+    Each centroid becomes the mean of every point ever assigned to it; the batch is
+    assigned with the centroids as they were before it, so the result equals the
+    sequential update over the batch in any order. Returns new (centers, counts).
+    """
+    n_clusters, dims = centers.shape
+    batch_counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.zeros((n_clusters, dims))
+    np.add.at(sums, labels, reduced)
+    new_counts = counts + batch_counts
+    centers = np.array(centers, dtype=np.float64)
+    moved = batch_counts > 0
+    centers[moved] = (centers[moved] * counts[moved, None] + sums[moved]) / new_counts[moved, None]
+    return centers, new_counts
+
+
+def incremental_estimator(classifier):
+    # (transform in front of it, estimator with partial_fit) for a classifier or classifier Pipeline,
+    # the scaler / kernel map steps stay as fitted so the learned weights keep their meaning
+    if isinstance(classifier, Pipeline):
+        final = classifier.steps[-1][1]
+        transform = classifier[:-1].transform if len(classifier.steps) > 1 else None
+    else:
+        final, transform = classifier, None
+    if not hasattr(final, "partial_fit"):
+        return None, None
+    return transform, final
+
+
+def own_arrays(estimator):
+    """Swap the memory-mapped or read-only arrays of a fitted estimator for in-memory copies.
+
+    Walks Pipeline steps and estimator-valued attributes (TfidfVectorizer's inner
+    transformer) too. A model restored with load_models(mmap_mode="r") can then be
+    updated in place without writing through to, or failing on, its bundle's files.
+    Returns how many arrays were copied.
+    """
+    if isinstance(estimator, Pipeline):
+        return sum(own_arrays(step) for _, step in estimator.steps)
+    if not hasattr(estimator, "__dict__"):
+        return 0
+    copied = 0
+    for attr, value in list(vars(estimator).items()):
+        if isinstance(value, np.ndarray):
+            if isinstance(value, np.memmap) or not value.flags.writeable:
+                setattr(estimator, attr, np.array(value))
+                copied += 1
+        elif isinstance(value, BaseEstimator):
+            copied += own_arrays(value)
+    return copied
@@ -0,0 +1,164 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# prefix of every exported Prometheus metric
+METRIC_PREFIX = "autoilr"
+
+
+def current_rss():
+    # resident set size in bytes, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss():
+    # high-water mark of the process RSS in bytes (ru_maxrss is KB on Linux, bytes on macOS)
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class RunProfiler:
+    """Wall time, CPU time, memory and item counts for the named stages of a run.
+
+    Stages nest: a stage opened inside another is recorded as "outer/inner",
+    and the outer stage's figures include it. With trace_memory, every stage
+    also gets its peak traced Python allocation (tracemalloc), which slows
+    pure-Python code down noticeably. RSS figures are process-wide: rss is the
+    resident size when the stage ended, max_rss the process high-water mark
+    so far. Work done in child processes (spaCy with n_process > 1) only shows
+    up in wall time.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._stack = []
+        self._started_tracing = False
+        self.created = datetime.now(timezone.utc)
+
+    @contextmanager
+    def stage(self, name, items=None):
+        # yields the stage's record; set record["items"] inside the block if the count is only known later
+        path = f"{self._stack[-1]['name']}/{name}" if self._stack else name
+        record = {"name": path, "items": items}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            if self._stack:
+                # the parent's peak so far, before reset_peak starts this stage's own window
+                parent = self._stack[-1]
+                parent["_peak"] = max(parent["_peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            record["_peak"] = 0
+        self._stack.append(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            self._stack.pop()
+            if self.trace_memory:
+                record["peak_traced_bytes"] = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent["_peak"] = max(parent["_peak"], record["peak_traced_bytes"])
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            record["rss_bytes"] = current_rss()
+            record["max_rss_bytes"] = max_rss()
+            if record["items"] is not None and record["wall_seconds"] > 0:
+                record["items_per_second"] = record["items"] / record["wall_seconds"]
+            self.records.append(record)
+
+    def report(self, **metadata):
+        # records come out in the order the stages finished, so nested stages precede their parent
+        return {
+            "created": self.created.isoformat(timespec="seconds"),
+            "trace_memory": self.trace_memory,
+            **metadata,
+            "stages": self.records,
+        }
+
+    def write_json(self, path, **metadata):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**metadata), f, indent=2)
+
+    def aggregate(self):
+        # stage name -> totals over every time it ran (extract_features runs once for train and once for dev)
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["name"], {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "items": None})
+            total["runs"] += 1
+            total["wall_seconds"] += record["wall_seconds"]
+            total["cpu_seconds"] += record["cpu_seconds"]
+            if record["items"] is not None:
+                total["items"] = (total["items"] or 0) + record["items"]
+            for key in ("peak_traced_bytes", "max_rss_bytes"):
+                if record.get(key) is not None:
+                    total[key] = max(total.get(key, 0), record[key])
+        return totals
+
+    def to_prometheus(self):
+        # Prometheus text exposition format, one series per stage
+        metrics = [
+            ("stage_wall_seconds", "wall_seconds", "Wall clock time spent in the stage"),
+            ("stage_cpu_seconds", "cpu_seconds", "CPU time of this process spent in the stage"),
+            ("stage_items", "items", "Items (documents, rows) processed by the stage"),
+            ("stage_runs", "runs", "How many times the stage ran"),
+            ("stage_peak_traced_bytes", "peak_traced_bytes", "Peak traced Python allocation during the stage"),
+            ("stage_max_rss_bytes", "max_rss_bytes", "Process RSS high-water mark when the stage ended"),
+        ]
+        totals = self.aggregate()
+        lines = []
+        for metric, key, help_text in metrics:
+            series = [(name, total[key]) for name, total in totals.items() if total.get(key) is not None]
+            if not series:
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+            for name, value in series:
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{METRIC_PREFIX}_{metric}{{stage="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # e.g. into the node_exporter textfile collector directory
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.to_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def format_table(self):
+        lines = [f"{'Stage':<48}{'Wall s':>10}{'CPU s':>10}{'Items':>10}{'Items/s':>12}{'Peak MB':>10}"]
+        for name, total in self.aggregate().items():
+            items = total["items"]
+            rate = items / total["wall_seconds"] if items is not None and total["wall_seconds"] > 0 else None
+            peak = total.get("peak_traced_bytes")
+            lines.append(f"{name:<48}{total['wall_seconds']:>10.2f}{total['cpu_seconds']:>10.2f}"
+                         f"{items if items is not None else '-':>10}"
+                         f"{f'{rate:,.0f}' if rate is not None else '-':>12}"
+                         f"{f'{peak / (1 << 20):.1f}' if peak is not None else '-':>10}")
+        return "\n".join(lines)
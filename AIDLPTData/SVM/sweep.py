@@ -0,0 +1,233 @@
+import os
+import copy
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from threadpoolctl import threadpool_limits
+
+from baseline_class import AutoILR, CLASSIFIERS
+
+# Hyperparameter sweep over desiredFeatures x numberPCAComponents x numberClusters.
+#
+# Loading, spaCy parsing, the training statistics, the TFIDF fit and features 1-3 do not depend
+# on the configuration, so they run once in the parent. Configurations sharing a (PCA components,
+# clusters) pair share one reduction + clustering fit (feature 4), and each such group runs as
+# one task in a process pool; only the classifier is trained per configuration.
+
+# Configuration-independent state, set before the pool starts. Forked workers inherit it
+# copy-on-write; elsewhere it is pickled once per worker by the initializer, never per task.
+_shared = None
+
+def parse_features(value):
+    # "1,2,4" -> (1, 2, 4)
+    features = tuple(sorted({int(feature) for feature in value.split(",") if feature.strip()}))
+    if not features or not set(features) <= {1, 2, 3, 4}:
+        raise argparse.ArgumentTypeError(f"features must be a comma separated subset of 1,2,3,4, got {value!r}")
+    return features
+
+def build_grid(feature_sets, pca_components, clusters):
+    # feature 4 is the only one PCA/KMeans feed, so a feature set without it is trained once
+    # instead of once per (components, clusters) pair
+    configs = []
+    for features in dict.fromkeys(tuple(sorted(features)) for features in feature_sets):
+        if 4 in features:
+            configs += [{"features": features, "pca_components": n_components, "clusters": n_clusters}
+                        for n_components, n_clusters in itertools.product(pca_components, clusters)]
+        else:
+            configs.append({"features": features, "pca_components": None, "clusters": None})
+    return configs
+
+def group_configs(configs):
+    # (pca_components, clusters) -> feature sets, the most expensive fits first so the
+    # longest tasks start before the pool fills up with short ones
+    groups = {}
+    for config in configs:
+        groups.setdefault((config["pca_components"], config["clusters"]), []).append(config["features"])
+    return sorted(groups.items(), key=lambda item: -((item[0][0] or 0) * (item[0][1] or 0)))
+
+def prepare_shared(model, feature_sets):
+    """Run the configuration-independent part of AutoILR.run once"""
+    timings = {}
+    start = time.perf_counter()
+    train_docs, train_labels = model.load_documents(model.trainingPath)
+    dev_docs, dev_labels = model.load_documents(model.devPath)
+    timings["load_documents"] = time.perf_counter() - start
+
+    needed = set().union(*feature_sets) - {4}
+    start = time.perf_counter()
+    train_sentence_lengths = model.tokenize_documents(train_docs)
+    dev_sentence_lengths = model.tokenize_documents(dev_docs) if needed & {1, 2} else None
+    timings["tokenize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.calculate_training_statistics(train_docs, train_sentence_lengths)
+    model.fit_tfidf(train_docs, dev_docs)
+    timings["statistics_tfidf"] = time.perf_counter() - start
+
+    model.label_encoder = LabelEncoder()
+    y_train = model.label_encoder.fit_transform(train_labels)
+    y_dev = model.label_encoder.transform(dev_labels)
+
+    start = time.perf_counter()
+    columns = {"train": {}, "dev": {}}
+    for feature in sorted(needed):
+        columns["train"][feature] = model.compute_feature(feature, np.arange(len(train_docs)), train_sentence_lengths,
+                                                          model.tfidf_train)
+        columns["dev"][feature] = model.compute_feature(feature, np.arange(len(dev_docs)), dev_sentence_lengths,
+                                                        model.tfidf_dev)
+    timings["features"] = time.perf_counter() - start
+
+    # nothing below is needed by the workers, and each worker would otherwise carry a copy
+    model.profiler = None
+    model.feature_cache = None
+    model.legacyPickles = False
+    return {"model": model, "columns": columns, "y_train": y_train, "y_dev": y_dev, "timings": timings}
+
+def fit_cluster_feature(model, columns, n_components, n_clusters):
+    # fit the reduction + clustering for one (components, clusters) pair and add feature 4 to columns
+    model.numberPCAComponents = n_components
+    model.numberClusters = n_clusters
+    model.fit_pca_kmeans()
+    columns["train"][4] = model.cluster_indices
+    columns["dev"][4] = model.compute_feature(4, np.arange(model.tfidf_dev.shape[0]), tfidf_matrix=model.tfidf_dev)
+
+def _init_worker(shared, threads):
+    global _shared
+    if shared is not None:
+        _shared = shared
+    # n workers each running KMeans / BLAS on every core would just fight over them
+    threadpool_limits(threads)
+
+def run_group(n_components, n_clusters, feature_sets):
+    """Fit PCA/KMeans once for one (components, clusters) pair, then a classifier per feature set"""
+    model = copy.copy(_shared["model"])
+    columns = {split: dict(values) for split, values in _shared["columns"].items()}
+    y_train, y_dev = _shared["y_train"], _shared["y_dev"]
+
+    fit_seconds = 0.0
+    if n_components is not None:
+        start = time.perf_counter()
+        fit_cluster_feature(model, columns, n_components, n_clusters)
+        fit_seconds = time.perf_counter() - start
+
+    results = []
+    for features in feature_sets:
+        start = time.perf_counter()
+        X_train = np.column_stack([columns["train"][feature] for feature in features])
+        X_dev = np.column_stack([columns["dev"][feature] for feature in features])
+        model.desiredFeatures = list(features)
+        model.train_svm(X_train, y_train)
+        accuracy = model.evaluate_model(X_dev, y_dev)
+        results.append({
+            "features": list(features),
+            "pca_components": n_components,
+            "clusters": n_clusters,
+            "accuracy": float(accuracy),
+            "fit_seconds": fit_seconds,
+            "svm_seconds": time.perf_counter() - start,
+            "pid": os.getpid(),
+        })
+    return results
+
+def failed_group(n_components, n_clusters, feature_sets, error):
+    return [{"features": list(features), "pca_components": n_components, "clusters": n_clusters,
+             "accuracy": None, "error": f"{type(error).__name__}: {error}"} for features in feature_sets]
+
+def run_sweep(model, configs, workers=1, threads_per_worker=1):
+    """Evaluate every configuration, returns the results ranked best first and the timings"""
+    global _shared
+    feature_sets = [config["features"] for config in configs]
+    start = time.perf_counter()
+    shared = prepare_shared(model, feature_sets)
+    timings = {"shared_seconds": time.perf_counter() - start, "shared": shared.pop("timings")}
+
+    groups = group_configs(configs)
+    results = []
+    start = time.perf_counter()
+    if workers <= 1:
+        _shared = shared
+        for (n_components, n_clusters), group in groups:
+            try:
+                results += run_group(n_components, n_clusters, group)
+            except Exception as error:
+                print(f"❌ PCA {n_components} / {n_clusters} clusters failed: {error}")
+                results += failed_group(n_components, n_clusters, group, error)
+    else:
+        fork = "fork" in multiprocessing.get_all_start_methods()
+        if fork:
+            _shared = shared
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context("fork") if fork else None,
+                                       initializer=_init_worker,
+                                       initargs=(None if fork else shared, threads_per_worker))
+        with executor:
+            futures = {executor.submit(run_group, n_components, n_clusters, group): (n_components, n_clusters, group)
+                       for (n_components, n_clusters), group in groups}
+            for future in as_completed(futures):
+                n_components, n_clusters, group = futures[future]
+                try:
+                    results += future.result()
+                except Exception as error:
+                    print(f"❌ PCA {n_components} / {n_clusters} clusters failed: {error}")
+                    results += failed_group(n_components, n_clusters, group, error)
+    timings["sweep_seconds"] = time.perf_counter() - start
+    # what the same configurations cost back to back, each group's fit counted once
+    timings["task_seconds"] = (sum({(r["pca_components"], r["clusters"]): r["fit_seconds"]
+                                    for r in results if r["accuracy"] is not None}.values())
+                               + sum(r["svm_seconds"] for r in results if r["accuracy"] is not None))
+    _shared = None
+
+    # best accuracy first, the cheaper configuration first among equals, failures last
+    results.sort(key=lambda r: (r["accuracy"] is None, -(r["accuracy"] or 0),
+                                r.get("fit_seconds", 0) + r.get("svm_seconds", 0)))
+    for rank, result in enumerate(results, 1):
+        result["rank"] = rank
+    return results, timings
+
+def format_results(results):
+    lines = [f"{'Rank':>4}  {'Features':<10}{'PCA':>6}{'Clusters':>10}{'Accuracy':>10}{'Fit s':>9}{'SVM s':>9}"]
+    for r in results:
+        accuracy = f"{r['accuracy']:.3f}" if r["accuracy"] is not None else "failed"
+        lines.append(f"{r['rank']:>4}  {','.join(map(str, r['features'])):<10}"
+                     f"{r['pca_components'] if r['pca_components'] is not None else '-':>6}"
+                     f"{r['clusters'] if r['clusters'] is not None else '-':>10}{accuracy:>10}"
+                     f"{r.get('fit_seconds', 0):>9.2f}{r.get('svm_seconds', 0):>9.2f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank AutoILR configurations on the dev set, sharing the preprocessing")
+    parser.add_argument("--training-path", default="trainEnglish.json")
+    parser.add_argument("--dev-path", default="devEnglish.json")
+    parser.add_argument("--features", nargs="+", type=parse_features, default=[(1, 2, 3, 4)],
+                        help="feature sets to try, e.g. 1,2,3,4 1,2,4")
+    parser.add_argument("--pca-components", nargs="+", type=int, default=[10])
+    parser.add_argument("--clusters", nargs="+", type=int, default=[300])
+    parser.add_argument("--reduction-method", default="pca", choices=["pca", "svd", "incremental"])
+    parser.add_argument("--clustering-method", default="kmeans", choices=["kmeans", "minibatch", "incremental"])
+    parser.add_argument("--classifier", default="svc", choices=CLASSIFIERS)
+    parser.add_argument("--batch-size", type=int, default=256, help="spaCy batch size")
+    parser.add_argument("--n-process", type=int, default=1, help="spaCy processes for the shared tokenization")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes fitting configurations")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="BLAS/OpenMP threads in each worker")
+    parser.add_argument("--output", default="sweep_results.json")
+    args = parser.parse_args()
+
+    model = AutoILR(trainingPath=args.training_path, devPath=args.dev_path, batchSize=args.batch_size,
+                    nProcess=args.n_process, reductionMethod=args.reduction_method,
+                    clusteringMethod=args.clustering_method, classifier=args.classifier, legacyPickles=False)
+    configs = build_grid(args.features, args.pca_components, args.clusters)
+    print(f"Sweeping {len(configs)} configurations over {args.workers} workers...")
+    results, timings = run_sweep(model, configs, args.workers, args.threads_per_worker)
+
+    print(format_results(results))
+    print(f"\nShared preprocessing {timings['shared_seconds']:.1f}s, sweep {timings['sweep_seconds']:.1f}s "
+          f"({timings['task_seconds']:.1f}s of fitting)")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "timings": timings, "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
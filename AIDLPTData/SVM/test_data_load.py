@@ -0,0 +1,71 @@
+import gzip
+import json
+
+import pytest
+
+pytest.importorskip("spacy")
+import data_load
+
+def write_corpus(path, n=200):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            # every tenth document repeats an earlier text, duplicates must land in one split
+            k = i - 5 if i % 10 == 9 else i
+            text = f"Document {k} opens here. It has {k % 4 + 1} more sentences! " + "Another one follows. " * (k % 4)
+            f.write(json.dumps({"text": text.strip(), "label": f"ILR{k % 5}"}) + "\n")
+        f.write("\n")
+
+def read_lines(path, compress):
+    with (gzip.open(path, "rt", encoding="utf-8") if compress else open(path, encoding="utf-8")) as f:
+        return f.read().splitlines()
+
+@pytest.fixture(scope="module")
+def nlp():
+    return data_load.load_segmenter(segmenter="rule")
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_merged_shards_match_the_unsharded_split(tmp_path, nlp, compress):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus)
+    names = data_load.DEFAULT_NAMES
+
+    whole = data_load.output_paths(tmp_path / "whole", names, compress)
+    counts = data_load.split_documents(nlp, data_load.read_documents([corpus]), whole, compress=compress)
+
+    num_shards = 3
+    for shard_index in range(num_shards):
+        paths = data_load.output_paths(tmp_path / "sharded", names, compress, shard_index, num_shards)
+        data_load.split_documents(nlp, data_load.read_documents([corpus], shard_index, num_shards), paths,
+                                  compress=compress)
+    merged_counts = data_load.merge_shards(tmp_path / "sharded", names, compress)
+
+    assert merged_counts == counts
+    assert sum(counts) == 200 and all(counts)
+    merged = data_load.output_paths(tmp_path / "sharded", names, compress)
+    for whole_path, merged_path in zip(whole, merged):
+        # shards are concatenated in shard order, so only the set of lines is the same
+        assert sorted(read_lines(merged_path, compress)) == sorted(read_lines(whole_path, compress))
+
+def test_split_is_deterministic_and_keeps_duplicates_together(tmp_path, nlp):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus)
+    runs = []
+    for run in ("a", "b"):
+        paths = data_load.output_paths(tmp_path / run, data_load.DEFAULT_NAMES)
+        data_load.split_documents(nlp, data_load.read_documents([corpus]), paths, n_process=1)
+        runs.append([read_lines(path, False) for path in paths])
+    assert runs[0] == runs[1]
+
+    seen = {}
+    for split, lines in enumerate(runs[0]):
+        for line in lines:
+            assert seen.setdefault(" ".join(json.loads(line)["text"]), split) == split
+
+def test_merge_refuses_missing_shards(tmp_path, nlp):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus)
+    for shard_index in (0, 2):
+        paths = data_load.output_paths(tmp_path, data_load.DEFAULT_NAMES, False, shard_index, 3)
+        data_load.split_documents(nlp, data_load.read_documents([corpus], shard_index, 3), paths)
+    with pytest.raises(ValueError):
+        data_load.merge_shards(tmp_path, data_load.DEFAULT_NAMES)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.special import kl_div
+
+# baseline_class loads spaCy and the punkt tokenizer at import time
+pytest.importorskip("spacy")
+pytest.importorskip("nltk")
+from baseline_class import AutoILR
+
+def dense_kl_divergence(tfidf_row, vocab_size):
+    # the original per-document feature: densify, normalize, compare with the uniform distribution
+    tfidf_dense = tfidf_row.toarray()[0]
+    total = tfidf_dense.sum()
+    p = tfidf_dense / total if total > 0 else np.ones(vocab_size) / vocab_size
+    return kl_div(p, np.ones(vocab_size) / vocab_size).sum()
+
+@pytest.mark.parametrize("density", [0.0, 0.01, 0.2, 1.0])
+def test_batch_matches_dense_per_document(density):
+    rng = np.random.default_rng(0)
+    vocab_size = 500
+    matrix = sparse.random(40, vocab_size, density=density, format="lil", random_state=rng)
+    # an all-zero row scores 0 either way
+    matrix[3] = 0
+    matrix = matrix.tocsr()
+
+    batch = AutoILR.compute_kl_divergence_batch(matrix, vocab_size)
+    dense = [dense_kl_divergence(matrix[i], vocab_size) for i in range(matrix.shape[0])]
+    np.testing.assert_allclose(batch, dense, rtol=1e-10, atol=1e-12)
+
+def test_batch_accepts_other_sparse_formats():
+    rng = np.random.default_rng(1)
+    matrix = sparse.random(10, 50, density=0.3, format="csr", random_state=rng)
+    np.testing.assert_allclose(AutoILR.compute_kl_divergence_batch(matrix.tocoo(), 50),
+                               AutoILR.compute_kl_divergence_batch(matrix, 50))
@@ -0,0 +1,39 @@
+import sys
+import json
+import argparse
+
+from baseline_class import AutoILR
+from incremental import DRIFT_THRESHOLDS
+
+# Incremental retraining: fold a file of newly labeled documents ({"text", "label"} per line,
+# like the training file) into a saved model instead of rerunning AutoILR.run() over everything.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a trained AutoILR model with newly labeled documents")
+    parser.add_argument("new_path", help="JSONL file with only the new documents")
+    parser.add_argument("--artifact-dir", default="ilr_artifacts", help="bundle to update, rewritten in place")
+    parser.add_argument("--dev-path", help="also report the dev accuracy after the update")
+    parser.add_argument("--vocabulary", choices=["fixed", "grow"], default="fixed",
+                        help="grow: add unseen terms of the new documents and recompute the IDF weights")
+    parser.add_argument("--min-df", type=int, default=2, help="new documents a term needs to join the vocabulary")
+    parser.add_argument("--max-new-terms", type=int, default=1000)
+    parser.add_argument("--epochs", type=int, default=1, help="partial_fit passes over the new documents")
+    for name, value in DRIFT_THRESHOLDS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value,
+                            help=f"drift threshold (default {value})")
+    parser.add_argument("--dry-run", action="store_true", help="report without saving the updated model")
+    parser.add_argument("--report", help="write the update report as JSON")
+    parser.add_argument("--fail-on-drift", action="store_true",
+                        help="exit with status 1 when a drift check recommends a full refit")
+    args = parser.parse_args()
+
+    model = AutoILR(artifactDir=args.artifact_dir, legacyPickles=False)
+    model.load_models(mmap_mode=None)
+    report = model.update(args.new_path, args.dev_path, args.vocabulary, args.min_df, args.max_new_terms,
+                          args.epochs, {name: getattr(args, name) for name in DRIFT_THRESHOLDS},
+                          save=not args.dry_run)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.fail_on_drift and report["refit_recommended"]:
+        sys.exit(1)
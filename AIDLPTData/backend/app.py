@@ -1,24 +1,144 @@
-from flask import Flask, request, jsonify
-import psycopg2
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 import os
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from psycopg2 import sql
 from dotenv import load_dotenv
+from db import ConnectionPool, stream_query
+from predictor import AUTOILR_PATH, ILRPredictor, MicroBatcher
 
 # Load environment variables
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool settings, one pool per app process
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "10"))
+DB_HEALTH_CHECK_S = float(os.getenv("DB_HEALTH_CHECK_S", "30"))
+DB_CURSOR_ITERSIZE = int(os.getenv("DB_CURSOR_ITERSIZE", "2000"))
+
+# /get_text columns clients may project with fields=, and page size caps
+TEXT_FIELDS = ["id", "language", "english_text", "translated_text", "ilr_level"]
+GET_TEXT_DEFAULT_LIMIT = 10
+GET_TEXT_MAX_JSON_LIMIT = int(os.getenv("GET_TEXT_MAX_JSON_LIMIT", "1000"))
+NDJSON_ROWS_PER_CHUNK = 500
+
+# Trained AutoILR bundle and micro-batching settings for /predict_ilr
+ILR_ARTIFACT_DIR = os.getenv("ILR_ARTIFACT_DIR", os.path.join(AUTOILR_PATH, "ilr_artifacts"))
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+PREDICT_TIMEOUT_S = float(os.getenv("PREDICT_TIMEOUT_S", "30"))
+
 app = Flask(__name__)
+db_pool = ConnectionPool(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT_S, DB_HEALTH_CHECK_S)
+
+# Load the models once at startup; without a trained bundle /predict_ilr answers 503
+if os.path.exists(os.path.join(ILR_ARTIFACT_DIR, "manifest.json")):
+    predictor = ILRPredictor(ILR_ARTIFACT_DIR)
+    batcher = MicroBatcher(predictor.predict, PREDICT_MAX_BATCH_SIZE, PREDICT_MAX_WAIT_MS)
+else:
+    print(f"⚠️ No ILR artifacts found in {ILR_ARTIFACT_DIR}, /predict_ilr is disabled")
+    batcher = None
+
+def get_db():
+    # check out one pooled connection per request, returned in release_db
+    if "db" not in g:
+        g.db = db_pool.getconn()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop("db", None)
+    if conn is not None:
+        db_pool.putconn(conn)
+
+def build_text_query(lang, fields, ilr_level, after_id, limit):
+    # keyset pagination on id: "id > after_id ORDER BY id" stays an index range scan however deep the page
+    conditions = [sql.SQL("language = %s")]
+    params = [lang]
+    if ilr_level is not None:
+        conditions.append(sql.SQL("ilr_level = %s"))
+        params.append(ilr_level)
+    if after_id is not None:
+        conditions.append(sql.SQL("id > %s"))
+        params.append(after_id)
+    query = sql.SQL("SELECT {fields} FROM text_data WHERE {conditions} ORDER BY id").format(
+        fields=sql.SQL(", ").join(sql.Identifier(field) for field in fields),
+        conditions=sql.SQL(" AND ").join(conditions),
+    )
+    if limit:
+        query += sql.SQL(" LIMIT %s")
+        params.append(limit)
+    return query, params
 
 @app.route('/get_text', methods=['GET'])
 def get_text():
+    # ?language=ms&fields=id,translated_text&ilr_level=2&after_id=1200&limit=100&format=ndjson
     lang = request.args.get("language", "en")
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM text_data WHERE language = %s LIMIT 10", (lang,))
-    results = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify(results)
+    ilr_level = request.args.get("ilr_level")
+    ndjson = request.args.get("format") == "ndjson" or request.accept_mimetypes.best == "application/x-ndjson"
+    fields = request.args.get("fields")
+    fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else TEXT_FIELDS
+    unknown = [field for field in fields if field not in TEXT_FIELDS]
+    if unknown or not fields:
+        return jsonify({"error": f"Unknown fields {unknown}, choose from {TEXT_FIELDS}"}), 400
+    try:
+        after_id = int(request.args["after_id"]) if "after_id" in request.args else None
+        limit = int(request.args.get("limit", GET_TEXT_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "after_id and limit must be integers"}), 400
+    # limit=0 means "everything" and is only allowed when streaming
+    if limit < 0 or (not ndjson and not 0 < limit <= GET_TEXT_MAX_JSON_LIMIT):
+        return jsonify({"error": f"limit must be between 1 and {GET_TEXT_MAX_JSON_LIMIT} (0 = all, ndjson only)"}), 400
+
+    # the id is always selected so the next page's cursor is known, then dropped if not requested
+    query, params = build_text_query(lang, fields if "id" in fields else ["id"] + fields, ilr_level, after_id, limit)
+    id_projected = "id" in fields
+
+    if ndjson:
+        def generate():
+            # rows go out as they arrive from the server-side cursor, a chunk of lines at a time
+            with db_pool.connection() as conn:
+                lines = []
+                for row in stream_query(conn, query, params, itersize=DB_CURSOR_ITERSIZE):
+                    values = row if id_projected else row[1:]
+                    lines.append(json.dumps(dict(zip(fields, values)), ensure_ascii=False, default=str))
+                    if len(lines) >= NDJSON_ROWS_PER_CHUNK:
+                        yield "\n".join(lines) + "\n"
+                        lines = []
+                if lines:
+                    yield "\n".join(lines) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    rows = list(stream_query(get_db(), query, params, itersize=DB_CURSOR_ITERSIZE))
+    response = jsonify([list(row) if id_projected else list(row[1:]) for row in rows])
+    if len(rows) == limit:
+        # cursor for the next page: pass it back as ?after_id=
+        response.headers["X-Next-After-Id"] = str(rows[-1][0])
+    return response
+
+@app.route('/predict_ilr', methods=['POST'])
+def predict_ilr():
+    # accepts {"text": "..."} or {"texts": ["...", ...]}
+    if batcher is None:
+        return jsonify({"error": "ILR model is not loaded"}), 503
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object with 'text' or 'texts'"}), 400
+    single = "texts" not in payload
+    texts = [payload.get("text")] if single else payload["texts"]
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        return jsonify({"error": "Expected a 'text' string or a non-empty 'texts' list of strings"}), 400
+    try:
+        levels = batcher.submit(texts, timeout=PREDICT_TIMEOUT_S)
+    except FutureTimeoutError:
+        return jsonify({"error": f"ILR prediction did not finish within {PREDICT_TIMEOUT_S:g}s, try again later"}), 503
+    if single:
+        return jsonify({"ilr_level": levels[0]})
+    return jsonify({"ilr_levels": levels})
 
 if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,109 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with blocking checkout and health checks.
+
+    Connections are opened lazily on first use. getconn() waits up to
+    checkout_timeout seconds for a free slot instead of failing straight away.
+    A connection that sat idle longer than health_check_interval is pinged
+    before it is handed out; failing ones are closed until a pooled or newly
+    opened connection passes, else PoolError.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, checkout_timeout=10.0, health_check_interval=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._returned_at = {}
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn)
+        return self._pool
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._returned_at.get(id(conn), 0.0)
+        if idle < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise pool.PoolError("Timed out waiting for a database connection")
+        try:
+            db_pool = self._get_pool()
+            # each failed check closes that connection, so after at most maxconn stale ones
+            # (a database restart leaves every pooled connection dead) the pool opens a new one
+            for _ in range(self.maxconn + 1):
+                conn = db_pool.getconn()
+                if self._healthy(conn):
+                    return conn
+                self._returned_at.pop(id(conn), None)
+                db_pool.putconn(conn, close=True)
+            raise pool.PoolError("No healthy database connection available")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            close = bool(conn.closed)
+            if not close:
+                try:
+                    # never hand the next request an open transaction
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+            if close:
+                self._returned_at.pop(id(conn), None)
+            else:
+                self._returned_at[id(conn)] = time.monotonic()
+            self._get_pool().putconn(conn, close=close)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        if self._pool is not None:
+            self._pool.closeall()
+
+
+def stream_query(conn, query, params=None, itersize=2000):
+    # server-side (named) cursor: rows arrive from Postgres itersize at a time instead of all at once
+    cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
@@ -0,0 +1,106 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+# AutoILR lives in ../SVM; point AUTOILR_PATH elsewhere when the code is mounted somewhere else
+AUTOILR_PATH = os.getenv("AUTOILR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SVM"))
+
+
+class ILRPredictor:
+    """Scores texts with a trained AutoILR artifact bundle, loaded once."""
+
+    def __init__(self, artifact_dir):
+        if AUTOILR_PATH not in sys.path:
+            sys.path.insert(0, AUTOILR_PATH)
+        from baseline_class import AutoILR
+
+        self.model = AutoILR(artifactDir=artifact_dir, legacyPickles=False)
+        self.model.load_models()
+
+    def predict(self, texts):
+        # one vectorized pass: batched spaCy parse, one TFIDF transform, one svm.predict
+        features = self.model.extract_features(texts)
+        labels = self.model.label_encoder.inverse_transform(self.model.svm.predict(features))
+        return [str(label) for label in labels]
+
+
+class MicroBatcher:
+    """Groups concurrent prediction requests into batches for one worker thread.
+
+    A batch is closed once it holds max_batch_size texts or max_wait_ms has
+    passed since its first request arrived, whichever comes first. A batch never
+    holds more than max_batch_size texts: larger requests are split into chunks
+    of that size, and a request that would overflow a batch opens the next one.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=64, max_wait_ms=5.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        # request taken off the queue that did not fit the previous batch
+        self._carry = None
+        self._worker = threading.Thread(target=self._run, name="ilr-micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts, timeout=None):
+        # raises concurrent.futures.TimeoutError when the results are not back within timeout seconds;
+        # chunks still waiting in the queue are then cancelled instead of being predicted for nobody
+        texts = list(texts)
+        futures = []
+        for start in range(0, max(len(texts), 1), self.max_batch_size):
+            future = Future()
+            self._queue.put((texts[start:start + self.max_batch_size], future))
+            futures.append(future)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            results = []
+            for future in futures:
+                results += future.result(timeout=max(deadline - time.monotonic(), 0) if deadline else None)
+            return results
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _collect(self):
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            # drop requests whose caller has already given up
+            batch = [(request_texts, future) for request_texts, future in self._collect()
+                     if future.set_running_or_notify_cancel()]
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                results = self.predict_batch(texts) if texts else []
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(results[offset:offset + len(request_texts)])
+                offset += len(request_texts)
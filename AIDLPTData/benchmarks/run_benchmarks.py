@@ -0,0 +1,393 @@
+import io
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+import synthetic_data
+
+# Benchmarks for the hot paths, on a synthetic corpus (see synthetic_data.py), fully offline.
+#
+#   python run_benchmarks.py --tier small medium
+#   python run_benchmarks.py --tier medium --database-url postgresql://... --compare results/before.json
+#
+# Every stage is timed (best of --repeat runs) without tracemalloc, then run once more under
+# tracemalloc for its peak Python allocation. Results are written as JSON; --compare prints the
+# change in throughput and peak memory against an earlier results file.
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+SCRIPTS_DIR = os.path.join(REPO_DIR, "data_extraction", "scripts")
+SVM_DIR = os.path.join(REPO_DIR, "SVM")
+DATABASE_DIR = os.path.join(REPO_DIR, "database")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+for path in (SCRIPTS_DIR, SVM_DIR, DATABASE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import label_data
+import store_data
+import pipeline
+
+# training documents and aligned lines per language for each size tier
+TIERS = {
+    "small": {"docs": 200, "lines": 2000},
+    "medium": {"docs": 2000, "lines": 20000},
+    "large": {"docs": 20000, "lines": 200000},
+}
+
+# --compare flags a stage whose throughput dropped by more than this fraction
+REGRESSION_THRESHOLD = 0.10
+
+class NullCursor:
+    """Stand-in for a psycopg2 cursor: consumes what store_data sends to COPY and drops it."""
+
+    def copy_expert(self, sql, file):
+        while file.read(1 << 16):
+            pass
+
+class Stage:
+    """One benchmark: setup() runs untimed before every run, run() returns how many items it handled."""
+
+    def __init__(self, name, unit, run, setup=None):
+        self.name = name
+        self.unit = unit
+        self.run = run
+        self.setup = setup
+
+def measure(stage, track_memory=False):
+    if stage.setup is not None:
+        stage.setup()
+    gc.collect()
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    items = stage.run()
+    seconds = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return items, seconds, cpu_seconds, peak
+
+def run_stage(stage, repeat=3, track_memory=True, verbose=False):
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        timings = [measure(stage) for _ in range(repeat)]
+        items, seconds, cpu_seconds, _ = min(timings, key=lambda timing: timing[1])
+        peak = measure(stage, track_memory=True)[3] if track_memory else None
+    result = {
+        "unit": stage.unit,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "rate": round(items / seconds, 1) if seconds else None,
+    }
+    if peak is not None:
+        result["peak_mb"] = round(peak / (1 << 20), 2)
+    return result
+
+# --- stages
+
+def label_stages(paths):
+    stages = []
+    for lang_code, aligned_path in paths["aligned"].items():
+        with open(aligned_path, "r", encoding="utf-8") as f:
+            targets = [line.rstrip("\n").split("\t")[1] for line in f]
+
+        def run(targets=targets, lang_code=lang_code):
+            for target in targets:
+                label_data.suggest_ilr_level(target, lang_code)
+            return len(targets)
+
+        # start every run from cold pattern and word caches
+        stages.append(Stage(f"suggest_ilr_level.{lang_code}", "lines", run, label_data._compiled_patterns.clear))
+    return stages
+
+def translation_file_stages(paths, work_dir, workers=1):
+    stages = []
+    for lang_code, aligned_path in paths["aligned"].items():
+        output_path = os.path.join(work_dir, f"rated_en-{lang_code}_aligned.txt")
+
+        def run(aligned_path=aligned_path, output_path=output_path):
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    result = label_data.process_translation_file(aligned_path, output_path, executor, workers)
+            else:
+                result = label_data.process_translation_file(aligned_path, output_path)
+            return result["line_count"]
+
+        stages.append(Stage(f"process_translation_file.{lang_code}", "lines", run,
+                            label_data._compiled_patterns.clear))
+    return stages
+
+def rate_corpus(paths, work_dir):
+    # the rated_ files store_data.py loads, labeled once up front
+    rated_dir = os.path.join(work_dir, "rated")
+    os.makedirs(rated_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for lang_code, aligned_path in paths["aligned"].items():
+            label_data.process_translation_file(aligned_path, os.path.join(rated_dir, f"rated_en-{lang_code}_aligned.txt"))
+    return rated_dir
+
+def store_stage(rated_dir, database_url=None, batch_size=store_data.DEFAULT_BATCH_SIZE):
+    files = store_data.find_aligned_files(rated_dir)
+
+    if database_url is None:
+        # stand-in: parsing, COPY escaping and buffering without a server
+        def run():
+            rows = 0
+            cursor = NullCursor()
+            for file_path, lang_code in files:
+                batch = []
+                for row in store_data.iter_rows(file_path, lang_code):
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        store_data.copy_rows(cursor, batch, table="text_data_staging")
+                        rows += len(batch)
+                        batch = []
+                if batch:
+                    store_data.copy_rows(cursor, batch, table="text_data_staging")
+                    rows += len(batch)
+            return rows
+
+        return Stage("store_data.null", "rows", run)
+
+    def setup():
+        # every run loads into empty tables
+        import psycopg2
+        conn = psycopg2.connect(database_url)
+        with conn, conn.cursor() as cursor:
+            cursor.execute("TRUNCATE text_data, ingest_manifest")
+        conn.close()
+
+    def run():
+        return sum(store_data.load_file_copy(file_path, lang_code, batch_size, database_url, rated_dir)["rows"]
+                   for file_path, lang_code in files)
+
+    return Stage("store_data.postgres", "rows", run, setup)
+
+def pipeline_stage(paths, database_url=None, label_workers=1):
+    archives = list(paths["archives"].values())
+
+    def setup():
+        label_data._compiled_patterns.clear()
+        if database_url is not None:
+            import psycopg2
+            conn = psycopg2.connect(database_url)
+            with conn, conn.cursor() as cursor:
+                cursor.execute("TRUNCATE text_data")
+            conn.close()
+
+    def run():
+        sink = "null" if database_url is None else "postgres"
+        runner = pipeline.Pipeline(database_url, label_workers=label_workers, report_interval=3600, sink=sink)
+        return runner.run(archives)["load_items"]
+
+    return Stage(f"pipeline.{'null' if database_url is None else 'postgres'}", "lines", run, setup)
+
+def feature_stages(paths):
+    # AutoILR needs spaCy (en_core_web_sm), nltk punkt and scikit-learn; without them the stage is skipped
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            from baseline_class import AutoILR
+    except (ImportError, OSError) as error:
+        return [], {"extract_features": {"skipped": f"{type(error).__name__}: {error}"}}
+
+    model = AutoILR(paths["train"], paths["dev"], numberClusters=20, legacyPickles=False)
+    train_docs, _ = model.load_documents(paths["train"])
+    dev_docs, _ = model.load_documents(paths["dev"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        lengths = model.tokenize_documents(train_docs)
+        model.calculate_training_statistics(train_docs, lengths)
+        model.fit_tfidf(train_docs, dev_docs)
+        model.fit_pca_kmeans()
+
+    stages = [
+        Stage("tokenize_documents", "docs", lambda: len(model.tokenize_documents(train_docs))),
+        Stage("extract_features", "docs", lambda: len(model.extract_features(train_docs))),
+    ]
+    return stages, {}
+
+# --- Postgres
+
+def schema_url(database_url, schema):
+    # connection string whose sessions use the benchmark schema, so nothing touches the real tables
+    if "://" in database_url:
+        separator = "&" if "?" in database_url else "?"
+        return f"{database_url}{separator}options=-csearch_path%3D{schema}"
+    return f"{database_url} options='-csearch_path={schema}'"
+
+@contextlib.contextmanager
+def benchmark_schema(database_url):
+    # a throwaway schema with the migrations applied, dropped again afterwards
+    import psycopg2
+    import migrate
+
+    schema = f"benchmark_{os.getpid()}"
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+    try:
+        url = schema_url(database_url, schema)
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate.apply_migrations(url)
+        yield url
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+# --- runs
+
+def prepare_corpus(tier, seed, data_dir=None):
+    # reuse data_dir/<tier>-<seed> if it was generated with the same sizes, otherwise (re)generate it
+    sizes = TIERS[tier]
+    out_dir = os.path.join(data_dir, f"{tier}-{seed}")
+    marker = os.path.join(out_dir, "corpus.json")
+    expected = {"tier": tier, "seed": seed, **sizes}
+    paths_file = os.path.join(out_dir, "paths.json")
+    if os.path.exists(marker) and os.path.exists(paths_file):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == expected:
+                with open(paths_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+    paths = synthetic_data.generate_corpus(out_dir, sizes["docs"], sizes["lines"], seed)
+    with open(paths_file, "w", encoding="utf-8") as f:
+        json.dump(paths, f)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(expected, f)
+    return paths
+
+def run_tier(tier, args, data_dir, database_url=None):
+    paths = prepare_corpus(tier, args.seed, data_dir)
+    work_dir = tempfile.mkdtemp(prefix=f"ilr-bench-{tier}-")
+    try:
+        stages = label_stages(paths) + translation_file_stages(paths, work_dir, args.workers)
+        rated_dir = rate_corpus(paths, work_dir)
+        stages.append(store_stage(rated_dir, database_url))
+        stages.append(pipeline_stage(paths, database_url, args.workers))
+        feature_list, results = feature_stages(paths) if not args.skip_features else ([], {})
+        stages += feature_list
+
+        for stage in stages:
+            if args.stage and not any(stage.name.startswith(prefix) for prefix in args.stage):
+                continue
+            print(f"  {tier} {stage.name}...", end=" ", flush=True)
+            results[stage.name] = run_stage(stage, args.repeat, not args.skip_memory, args.verbose)
+            result = results[stage.name]
+            peak = f", peak {result['peak_mb']:.1f} MB" if "peak_mb" in result else ""
+            print(f"{result['rate']:,.0f} {result['unit']}/sec ({result['items']:,} in {result['seconds']:.2f}s{peak})")
+        for name, result in results.items():
+            if "skipped" in result:
+                print(f"  {tier} {name}: skipped ({result['skipped']})")
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print the change per stage against a baseline results file, returns the regressed stages"""
+    regressions = []
+    print(f"\nCompared with {baseline.get('created')} ({baseline.get('git_commit') or 'unknown commit'}):")
+    print("=" * 96)
+    print(f"{'Tier':<8}{'Stage':<36}{'Baseline/s':>14}{'Current/s':>14}{'Change':>10}{'Peak MB':>14}")
+    print("-" * 96)
+    for tier, stages in current["tiers"].items():
+        for name, result in stages.items():
+            before = baseline.get("tiers", {}).get(tier, {}).get(name)
+            if not before or "rate" not in before or "rate" not in result:
+                continue
+            change = result["rate"] / before["rate"] - 1 if before["rate"] else 0.0
+            peak = ""
+            if "peak_mb" in result and "peak_mb" in before:
+                peak = f"{before['peak_mb']:.1f}→{result['peak_mb']:.1f}"
+            flag = ""
+            if change < -threshold:
+                flag = " ⚠️"
+                regressions.append((tier, name, change))
+            print(f"{tier:<8}{name:<36}{before['rate']:>14,.0f}{result['rate']:>14,.0f}{change:>+10.1%}{peak:>14}{flag}")
+    print("=" * 96)
+    if regressions:
+        print(f"⚠️ {len(regressions)} stage(s) more than {threshold:.0%} slower than the baseline")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the labeling, loading and feature extraction hot paths")
+    parser.add_argument("--tier", nargs="+", choices=list(TIERS), default=["small"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the fastest is kept")
+    parser.add_argument("--workers", type=int, default=1, help="label workers for process_translation_file and pipeline")
+    parser.add_argument("--stage", nargs="*", help="only run stages whose name starts with one of these")
+    parser.add_argument("--database-url", default=None,
+                        help="local Postgres to load into (in a throwaway schema); without it a null sink stands in")
+    parser.add_argument("--data-dir", default=None, help="keep the generated corpora here and reuse them")
+    parser.add_argument("--output", default=None, help="results file (default: results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if --compare finds any")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the extra tracemalloc run per stage")
+    parser.add_argument("--skip-features", action="store_true", help="skip the AutoILR stages")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the code under test")
+    args = parser.parse_args()
+
+    created = datetime.now(timezone.utc)
+    report = {
+        "created": created.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "workers": args.workers,
+        "sink": "postgres" if args.database_url else "null",
+        "tier_sizes": {tier: TIERS[tier] for tier in args.tier},
+        "tiers": {},
+    }
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="ilr-bench-data-")
+    try:
+        schema = benchmark_schema(args.database_url) if args.database_url else contextlib.nullcontext()
+        with schema as database_url:
+            for tier in args.tier:
+                print(f"Tier {tier} ({TIERS[tier]['docs']:,} docs, {TIERS[tier]['lines']:,} lines per language):")
+                report["tiers"][tier] = run_tier(tier, args, data_dir, database_url)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{created.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+
+# Deterministic synthetic data for the benchmarks: the same seed and sizes always produce
+# byte-identical files, so two benchmark runs only differ in the code under test.
+#
+#   train.jsonl / dev.jsonl          {"text": ..., "label": 0-4}, what AutoILR.load_documents reads
+#   aligned/en-xx_aligned.txt        "english\ttarget" lines, what label_data.py reads
+#   raw/Synthetic.en-xx.txt.zip      the same pairs as OPUS moses members, what pipeline.py reads
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_extraction", "scripts")
+
+LANGUAGES = ["ms", "ta", "tg"]
+
+# everyday words mixed in with the label_data.py keywords, so not every word is a hit
+FILLER_WORDS = {
+    "ms": ["saya", "dan", "yang", "di", "ini", "itu", "dengan", "untuk", "pada", "tidak", "ada", "akan",
+           "mereka", "kami", "rumah", "makan", "pergi", "baik", "besar", "orang", "hari", "air", "buku"],
+    "ta": ["நான்", "அவர்", "இது", "அது", "மற்றும்", "ஒரு", "வீடு", "நல்ல", "பெரிய", "மக்கள்", "செல்",
+           "இல்லை", "நாள்", "தண்ணீர்", "புத்தகம்"],
+    "tg": ["ман", "ва", "ин", "он", "бо", "барои", "дар", "не", "хона", "хуб", "калон", "мардум",
+           "рафтан", "рӯз", "об", "китоб"],
+}
+
+SIMPLE_ENGLISH = ["the", "a", "is", "was", "we", "they", "go", "see", "house", "water", "day", "good", "big",
+                  "people", "book", "eat", "come", "today", "and", "with", "to", "of", "in", "on", "it"]
+COMPLEX_ENGLISH = ["consequently", "infrastructure", "philosophical", "unprecedented", "jurisprudence",
+                   "macroeconomic", "epistemological", "notwithstanding", "sustainability", "ramifications",
+                   "constitutional", "hypothesis", "institutional", "interdependence", "ideological"]
+
+def keyword_vocabulary(lang_code):
+    # plain keywords from label_data.language_patterns, the words suggest_ilr_level looks for
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    from label_data import language_patterns
+
+    words = []
+    for name, pattern in language_patterns[lang_code].items():
+        if name in ("sentence_endings", "word_boundary", "syllable_pattern"):
+            continue
+        words += [word for word in pattern.split("|") if word and not set(word) & set("\\.^$*+?{}[]()")]
+    return words
+
+def english_sentence(rng, difficulty):
+    # difficulty 0-1: longer sentences with more long words as it grows
+    length = rng.randint(4, 8 + int(22 * difficulty))
+    words = [rng.choice(COMPLEX_ENGLISH) if rng.random() < 0.05 + 0.5 * difficulty else rng.choice(SIMPLE_ENGLISH)
+             for _ in range(length)]
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+def target_sentence(rng, lang_code, keywords, difficulty):
+    length = rng.randint(2, 6 + int(24 * difficulty))
+    words = [rng.choice(keywords) if rng.random() < 0.03 + 0.3 * difficulty else rng.choice(FILLER_WORDS[lang_code])
+             for _ in range(length)]
+    return " ".join(words) + rng.choice([".", ".", "?", "!", ""])
+
+def generate_aligned_lines(lang_code, n_lines, seed=0):
+    """Yield n_lines "english\\ttarget" lines for one language"""
+    rng = random.Random(f"{seed}-aligned-{lang_code}")
+    keywords = keyword_vocabulary(lang_code)
+    for _ in range(n_lines):
+        difficulty = rng.random()
+        yield f"{english_sentence(rng, difficulty)}\t{target_sentence(rng, lang_code, keywords, difficulty)}"
+
+def generate_documents(n_docs, seed=0, split="train"):
+    """Yield {"text", "label"} training documents, harder labels get longer sentences and rarer words"""
+    rng = random.Random(f"{seed}-documents-{split}")
+    for _ in range(n_docs):
+        label = rng.randint(0, 4)
+        difficulty = min(1.0, max(0.0, label / 4 + rng.uniform(-0.15, 0.15)))
+        n_sentences = rng.randint(1, 3 + 3 * label)
+        yield {"text": " ".join(english_sentence(rng, difficulty) for _ in range(n_sentences)), "label": label}
+
+def write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def write_aligned_file(path, lang_code, n_lines, seed=0):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in generate_aligned_lines(lang_code, n_lines, seed):
+            f.write(line + "\n")
+
+def write_opus_archive(path, lang_code, n_lines, seed=0):
+    # the aligned pairs split back into a moses-style .en / .xx member pair
+    name = f"Synthetic.en-{lang_code}"
+    english, target = [], []
+    for line in generate_aligned_lines(lang_code, n_lines, seed):
+        en_sentence, tgt_sentence = line.split("\t")
+        english.append(en_sentence + "\n")
+        target.append(tgt_sentence + "\n")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        # fixed timestamps keep the archive bytes reproducible
+        for member, lines in ((f"{name}.en", english), (f"{name}.{lang_code}", target)):
+            zip_ref.writestr(zipfile.ZipInfo(member, date_time=(2020, 1, 1, 0, 0, 0)), "".join(lines),
+                             compress_type=zipfile.ZIP_DEFLATED)
+
+def generate_corpus(out_dir, n_docs, n_lines, seed=0, languages=LANGUAGES):
+    """Write the full synthetic corpus under out_dir, returns the paths"""
+    os.makedirs(os.path.join(out_dir, "aligned"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "raw"), exist_ok=True)
+    paths = {
+        "train": os.path.join(out_dir, "train.jsonl"),
+        "dev": os.path.join(out_dir, "dev.jsonl"),
+        "aligned": {},
+        "archives": {},
+    }
+    write_jsonl(paths["train"], generate_documents(n_docs, seed, "train"))
+    write_jsonl(paths["dev"], generate_documents(max(1, n_docs // 5), seed, "dev"))
+    for lang_code in languages:
+        paths["aligned"][lang_code] = os.path.join(out_dir, "aligned", f"en-{lang_code}_aligned.txt")
+        write_aligned_file(paths["aligned"][lang_code], lang_code, n_lines, seed)
+        paths["archives"][lang_code] = os.path.join(out_dir, "raw", f"Synthetic.en-{lang_code}.txt.zip")
+        write_opus_archive(paths["archives"][lang_code], lang_code, n_lines, seed)
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic corpus for the benchmarks")
+    parser.add_argument("out_dir")
+    parser.add_argument("--docs", type=int, default=1000, help="training documents (dev gets a fifth of that)")
+    parser.add_argument("--lines", type=int, default=10000, help="aligned lines per language")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_corpus(args.out_dir, args.docs, args.lines, args.seed)
+    print(f"✅ Synthetic corpus written to {args.out_dir}")
@@ -1,54 +1,135 @@
 import os
+import argparse
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor
 
 input_dir = os.path.abspath("data/extracted_opus")  # Directory containing raw OPUS files
 output_dir = os.path.abspath("data/processed_opus")  # Directory to save processed files
-os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
 
 target_languages = ["ms", "ta", "tg"]
 
-def process_and_align_sentences(en_file, tgt_file, output_file):
+# Write buffer for the aligned output files
+WRITE_BUFFER_SIZE = 1 << 20
+
+def align_streams(en_lines, tgt_lines, out_f):
+    # Walks both sides together and writes "en\ttgt" lines to out_f as it goes, so only one
+    # pair is in memory at a time. Any iterables of lines work (open files, zip members, ...).
+    # Returns {"aligned", "en_lines", "tgt_lines", "divergence"}, where divergence is the first
+    # line number that only one side has (None when the line counts match).
+    aligned = 0
+    en_count = 0
+    tgt_count = 0
+    divergence = None
+    missing = object()
+    for en_sentence, tgt_sentence in zip_longest(en_lines, tgt_lines, fillvalue=missing):
+        if en_sentence is not missing:
+            en_count += 1
+        if tgt_sentence is not missing:
+            tgt_count += 1
+        if en_sentence is missing or tgt_sentence is missing:
+            if divergence is None:
+                divergence = aligned + 1
+            continue
+        out_f.write(f"{en_sentence.strip()}\t{tgt_sentence.strip()}\n")
+        aligned += 1
+    return {"aligned": aligned, "en_lines": en_count, "tgt_lines": tgt_count, "divergence": divergence}
+
+def aligned_output_name(en_name):
+    # "<corpus>.en-xx_aligned.txt" for the English side "<corpus>.en-xx.en", so pairs of the same
+    # language from different datasets never share an output file
+    return os.path.basename(en_name)[:-len(".en")] + "_aligned.txt"
+
+def check_unique_outputs(outputs):
+    # outputs: (output_file, source) pairs; two sources writing one file would overwrite each other
+    # (or, run in parallel, share its .tmp file), so refuse before any work starts
+    seen = {}
+    for output_file, source in outputs:
+        if output_file in seen:
+            raise ValueError(f"{seen[output_file]} and {source} would both be aligned into {output_file}")
+        seen[output_file] = source
+
+def write_aligned(en_lines, tgt_lines, output_file, tgt_name, tolerant=False):
+    # align_streams into output_file + ".tmp", renamed into place only if the pair is kept
+    temp_file = output_file + ".tmp"
     try:
-        with open(en_file, "r", encoding="utf-8", errors="replace") as en_f, open(tgt_file, "r", encoding="utf-8", errors="replace") as tgt_f:
-            en_sentences = en_f.readlines()
-            tgt_sentences = tgt_f.readlines()
+        with open(temp_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as out_f:
+            result = align_streams(en_lines, tgt_lines, out_f)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
 
-        # Ensure the files have the same number of lines
-        if len(en_sentences) != len(tgt_sentences):
-            print(f"Mismatch in line count: {len(en_sentences)} EN ↔ {len(tgt_sentences)} {tgt_file}, skipping...")
-            return
+    if result["divergence"] is not None:
+        # Ensure the files have the same number of lines, or keep the aligned prefix in tolerant mode
+        if not tolerant:
+            os.remove(temp_file)
+            print(f"Mismatch in line count: {result['en_lines']} EN ↔ {result['tgt_lines']} {tgt_name}, skipping...")
+            return result
+        print(f"⚠️ Mismatch in line count: {result['en_lines']} EN ↔ {result['tgt_lines']} {tgt_name}, "
+              f"first divergence at line {result['divergence']}, keeping the {result['aligned']} aligned lines")
 
-        # Write aligned sentences to output file
-        with open(output_file, "w", encoding="utf-8") as out_f:
-            for en_sentence, tgt_sentence in zip(en_sentences, tgt_sentences):
-                out_f.write(f"{en_sentence.strip()}\t{tgt_sentence.strip()}\n")
+    os.replace(temp_file, output_file)
+    print(f"Aligned sentences saved to {output_file}")
+    return result
 
-        print(f"Aligned sentences saved to {output_file}")
+def process_and_align_sentences(en_file, tgt_file, output_file, tolerant=False):
+    try:
+        with open(en_file, "r", encoding="utf-8", errors="replace") as en_f, open(tgt_file, "r", encoding="utf-8", errors="replace") as tgt_f:
+            return write_aligned(en_f, tgt_f, output_file, tgt_file, tolerant)
 
     except Exception as e:
         print(f"Error processing {en_file} ↔ {tgt_file}: {e}")
 
-# Step 1: Process each language pair
-for root, dirs, files in os.walk(input_dir):
-    for lang_code in target_languages:
-        # Find matching files for each target language
-        en_file = None
-        tgt_file = None
-        for file in files:
-            if file.endswith(f".en-{lang_code}.en"):  # English file
+def _align_task(args):
+    en_file, tgt_file = args[:2]
+    print(f"Processing {en_file} ↔ {tgt_file}...")
+    return process_and_align_sentences(*args)
+
+def find_language_pairs(input_dir=input_dir, output_dir=output_dir, target_languages=target_languages):
+    # (en_file, tgt_file, output_file) for every language pair found under input_dir
+    pairs = []
+    for root, dirs, files in os.walk(input_dir):
+        for lang_code in target_languages:
+            # Find matching files for each target language, every dataset in the directory
+            en_files = sorted(file for file in files if file.endswith(f".en-{lang_code}.en"))  # English files
+            if not en_files:
+                print(f"No matching files found for {lang_code} in {root}, skipping...")
+                continue
+
+            for file in en_files:
                 en_file = os.path.join(root, file)
-                tgt_file = os.path.join(root, file.replace(f".en-{lang_code}.en", f".en-{lang_code}.{lang_code}"))
-                break
-        
-        # Ensure we found the corresponding files
-        if not en_file or not tgt_file:
-            print(f"No matching files found for {lang_code} in {root}, skipping...")
-            continue
-        
-        # Create output file for the target language
-        output_file = os.path.join(output_dir, f"en-{lang_code}_aligned.txt")
+                tgt_file = os.path.join(root, file[:-len("en")] + lang_code)
+                if not os.path.exists(tgt_file):
+                    print(f"No {lang_code} file next to {en_file}, skipping...")
+                    continue
+
+                # Create output file for the dataset and target language
+                output_file = os.path.join(output_dir, aligned_output_name(file))
+                pairs.append((en_file, tgt_file, output_file))
+    return pairs
+
+def main(input_dir=input_dir, output_dir=output_dir, workers=1, tolerant=False):
+    os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
+
+    # Step 1: Process each language pair, several pairs at once when workers > 1
+    pairs = find_language_pairs(input_dir, output_dir)
+    check_unique_outputs([(output_file, en_file) for en_file, tgt_file, output_file in pairs])
+    tasks = [(en_file, tgt_file, output_file, tolerant) for en_file, tgt_file, output_file in pairs]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_align_task, tasks))
+    else:
+        results = [_align_task(task) for task in tasks]
 
-        # Process and align sentences
-        print(f"Processing {en_file} ↔ {tgt_file}...")
-        process_and_align_sentences(en_file, tgt_file, output_file)
+    print(" All language pair processing complete!")
+    return results
 
-print(" All language pair processing complete!")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align the extracted OPUS .en-xx.en / .en-xx.xx files line by line")
+    parser.add_argument("--input-dir", default=input_dir)
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("--workers", type=int, default=1, help="language pairs aligned in parallel")
+    parser.add_argument("--tolerant", action="store_true",
+                        help="on a line count mismatch keep the aligned prefix instead of skipping the pair")
+    args = parser.parse_args()
+    main(args.input_dir, args.output_dir, args.workers, args.tolerant)
@@ -1,66 +1,218 @@
 import os
-import subprocess
-import time
-
-# Define OPUS tools directory (where opus_get is located)
-opus_dir = r"D:\Adrian\AIDLPTData\AIDLPTData\myenv\Scripts"
+import json
+import hashlib
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from urllib.error import HTTPError, URLError
+from concurrent.futures import ThreadPoolExecutor
 
 # Define download directory
 download_dir = os.path.abspath("data/raw_opus")
-os.makedirs(download_dir, exist_ok=True)  # Ensure the folder exists
-
-# OPUS datasets to download
-datasets = [
-    ("en", "tg", "TED2020"), # English-Tajik
-    ("en", "ta", "Josuha-IPC"), # English-Tamil
-    ("en", "ms", "QED"), # English-Malay
-]
-
-def download_opus_data(src, tgt, dataset):
-    """Download OPUS dataset using opus_get"""
-    command = f'cd /d "{opus_dir}" && python opus_get -s {src} -t {tgt} -d {dataset} -p raw -dl "{download_dir}"'
-    
-    print(f"Downloading {dataset} ({src}-{tgt}) into {download_dir}...")
-    print(f"Running command: {command}")
-    
-    # Run the command and capture output
-    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    stdout, stderr = process.communicate()
-    
-    print("STDOUT:", stdout)
-    if stderr:
-        print("STDERR:", stderr)
-    
-    # Check if download was successful
-    if process.returncode != 0:
-        print(f"⚠️ Download process returned non-zero exit code: {process.returncode}")
+
+# OPUS datasets to download: a JSON list of {"src", "tgt", "dataset"} entries. An entry may also pin
+# "version" and "preprocessing", or give "url" (plus optional "size" and "sha256") to skip the OPUS API
+DATASETS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datasets.json")
+
+# OPUS API that resolves a dataset to its download URL
+OPUS_API_URL = os.getenv("OPUS_API_URL", "https://opus.nlpl.eu/opusapi/")
+
+# the aligners downstream read the moses (plain text, one sentence per line) files
+DEFAULT_PREPROCESSING = "moses"
+
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+REQUEST_TIMEOUT_S = 60
+
+# size and sha256 of every finished download, used to skip files that are already complete
+MANIFEST_NAME = "downloads.json"
+
+def load_datasets(config_path=DATASETS_CONFIG):
+    """Read the dataset list, filling in the defaults"""
+    with open(config_path, "r", encoding="utf-8") as f:
+        datasets = json.load(f)
+    for entry in datasets:
+        entry.setdefault("version", "latest")
+        entry.setdefault("preprocessing", DEFAULT_PREPROCESSING)
+    return datasets
+
+def resolve_download(entry, api_url=OPUS_API_URL):
+    """Return (url, expected size or None, expected sha256 or None) for one dataset entry"""
+    if "url" in entry:
+        return entry["url"], entry.get("size"), entry.get("sha256")
+
+    query = urllib.parse.urlencode({
+        "source": entry["src"],
+        "target": entry["tgt"],
+        "corpus": entry["dataset"],
+        "preprocessing": entry["preprocessing"],
+        "version": entry["version"],
+    })
+    with urllib.request.urlopen(f"{api_url}?{query}", timeout=REQUEST_TIMEOUT_S) as response:
+        corpora = json.load(response).get("corpora", [])
+    if not corpora:
+        raise ValueError(f"OPUS has no {entry['preprocessing']} files for {entry['dataset']} ({entry['src']}-{entry['tgt']})")
+    # the API's "size" is an approximate KB figure, so the exact size comes from the download itself
+    return corpora[0]["url"], None, None
+
+def download_filename(entry, url):
+    # OPUS names every moses zip "<src>-<tgt>.txt.zip", so prefix the dataset to keep them apart
+    return f"{entry['dataset']}.{os.path.basename(urllib.parse.urlparse(url).path)}"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DownloadManifest:
+    """downloads.json in the download directory, shared by the download threads."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, filename):
+        with self._lock:
+            return self.entries.get(filename)
+
+    def record(self, filename, url, size, sha256):
+        with self._lock:
+            self.entries[filename] = {"url": url, "size": size, "sha256": sha256}
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+def is_complete(path, url, expected_size, expected_sha256, manifest_entry):
+    """True if path already holds a verified copy of url"""
+    if not os.path.exists(path):
+        return False
+    size = os.path.getsize(path)
+    if expected_sha256 is None:
+        # nothing pinned in the config: trust the size and hash recorded when it was downloaded
+        if not manifest_entry or manifest_entry["url"] != url:
+            return False
+        expected_size = manifest_entry["size"] if expected_size is None else expected_size
+        expected_sha256 = manifest_entry["sha256"]
+    if expected_size is not None and size != expected_size:
         return False
-    
-    # Give some time for file system operations to complete
-    print("Waiting for file operations to complete...")
-    time.sleep(3)
-    
-    # List files in download directory to verify
-    print(f"Contents of download directory ({download_dir}):")
-    for file in os.listdir(download_dir):
-        print(f"  - {file}")
-    
-    return True
-
-def main():
+    return file_sha256(path) == expected_sha256
+
+def fetch(url, part_path):
+    """Download url into part_path, resuming from whatever part_path already holds. Returns the total size"""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    try:
+        response = urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_S)
+    except HTTPError as error:
+        if error.code == 416 and offset:
+            # nothing left past offset: the partial file is already whole
+            return offset
+        raise
+
+    with response:
+        if offset and response.status == 206:
+            mode = "ab"
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            total = int(total) if total.isdigit() else None
+        else:
+            # no Range support (200): start over
+            mode = "wb"
+            offset = 0
+            total = response.headers.get("Content-Length")
+            total = int(total) if total is not None else None
+        with open(part_path, mode) as f:
+            for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_SIZE), b""):
+                f.write(chunk)
+    return total if total is not None else os.path.getsize(part_path)
+
+def download_file(url, path, expected_size=None, expected_sha256=None, retries=DOWNLOAD_RETRIES):
+    """Download url to path through path + ".part", verifying size and checksum. Returns (size, sha256)"""
+    part_path = path + ".part"
+    for attempt in range(1, retries + 1):
+        try:
+            total = fetch(url, part_path)
+        except (HTTPError, URLError, OSError) as error:
+            # the .part file keeps what arrived, the next attempt resumes from there
+            print(f"⚠️ Attempt {attempt}/{retries} for {url} failed: {error}")
+            continue
+
+        size = os.path.getsize(part_path)
+        if size < total:
+            print(f"⚠️ Attempt {attempt}/{retries} for {url} stopped at {size} of {total} bytes")
+            continue
+        sha256 = file_sha256(part_path)
+        if (expected_size is not None and size != expected_size) or size != total or \
+                (expected_sha256 is not None and sha256 != expected_sha256):
+            # corrupt rather than short: resuming would keep the bad bytes
+            print(f"⚠️ Attempt {attempt}/{retries} for {url}: size or checksum mismatch, restarting")
+            os.remove(part_path)
+            continue
+        os.replace(part_path, path)
+        return size, sha256
+    raise RuntimeError(f"Giving up on {url} after {retries} attempts")
+
+def download_opus_data(entry, download_dir=download_dir, manifest=None, api_url=OPUS_API_URL):
+    """Download one OPUS dataset unless a verified copy is already there"""
+    name = f"{entry['dataset']} ({entry['src']}-{entry['tgt']})"
+    try:
+        url, expected_size, expected_sha256 = resolve_download(entry, api_url)
+        filename = download_filename(entry, url)
+        path = os.path.join(download_dir, filename)
+
+        if is_complete(path, url, expected_size, expected_sha256, manifest.get(filename) if manifest else None):
+            print(f"⏭️ {name}: {filename} is already downloaded and verified")
+            return {"dataset": name, "file": filename, "status": "skipped"}
+
+        print(f"Downloading {name} from {url}...")
+        size, sha256 = download_file(url, path, expected_size, expected_sha256)
+        if manifest is not None:
+            manifest.record(filename, url, size, sha256)
+        print(f"✅ Download completed for {name}: {filename} ({size:,} bytes)")
+        return {"dataset": name, "file": filename, "status": "downloaded", "size": size}
+
+    except Exception as error:
+        print(f"⚠️ Download failed for {name}: {error}")
+        return {"dataset": name, "status": "failed", "error": str(error)}
+
+def main(config_path=DATASETS_CONFIG, download_dir=download_dir, workers=DOWNLOAD_WORKERS, api_url=OPUS_API_URL):
     print(f"Starting OPUS data download...")
     print(f"Download directory: {download_dir}")
-    
-    for src, tgt, dataset in datasets:
-        print(f"\n{'='*80}\nDownloading {dataset} ({src}-{tgt})\n{'='*80}")
-        
-        if download_opus_data(src, tgt, dataset):
-            print(f"✅ Download completed for {dataset} ({src}-{tgt})")
-        else:
-            print(f"⚠️ Download failed for {dataset} ({src}-{tgt})")
-    
-    print("\n✅ All OPUS downloads completed!")
+    os.makedirs(download_dir, exist_ok=True)  # Ensure the folder exists
+
+    datasets = load_datasets(config_path)
+    manifest = DownloadManifest(download_dir)
+    # downloads are network-bound, so a few threads overlap them
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda entry: download_opus_data(entry, download_dir, manifest, api_url), datasets))
+
+    print(f"\n{'='*80}")
+    for status in ("downloaded", "skipped", "failed"):
+        count = sum(result["status"] == status for result in results)
+        print(f"{status.capitalize()}: {count}")
+    if any(result["status"] == "failed" for result in results):
+        print("\n⚠️ Some OPUS downloads failed, run again to resume them")
+    else:
+        print("\n✅ All OPUS downloads completed!")
     print(f"Downloaded data is available in: {download_dir}")
+    return results
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download the OPUS datasets listed in the config")
+    parser.add_argument("--config", default=DATASETS_CONFIG, help="JSON list of datasets to download")
+    parser.add_argument("--download-dir", default=download_dir)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="datasets downloaded at the same time")
+    parser.add_argument("--opus-api", default=OPUS_API_URL, help="OPUS API base URL (or set OPUS_API_URL)")
+    args = parser.parse_args()
+    main(args.config, args.download_dir, args.workers, args.opus_api)
@@ -1,6 +1,10 @@
 import os
 import re
 import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Define ILR level characteristics for classification
 ilr_levels = {
@@ -192,37 +196,127 @@ language_patterns = {
     }
 }
 
+# Bytes of input per chunk handed to a worker in parallel mode
+DEFAULT_CHUNK_SIZE = 4 << 20
+
+# Output write buffer, and how often (in seconds) progress is logged while a file is labeled
+WRITE_BUFFER_SIZE = 1 << 20
+PROGRESS_INTERVAL = 10.0
+
+# Regex metacharacters; a pattern without any of them (other than "|") is a plain keyword list
+REGEX_METACHARACTERS = set("\\.^$*+?{}[]()")
+
+# Distinct words remembered per language by the complex-word check before the memo is reset
+WORD_CACHE_SIZE = 200000
+
+# Compiled patterns per language code, built on first use
+_compiled_patterns = {}
+
+def keyword_trie_regex(pattern):
+    # Rewrites a "word1|word2|..." keyword list as a prefix trie, e.g. "pem(?:bangunan|ikiran)",
+    # so the regex engine follows one branch per character instead of trying every keyword in turn.
+    # It matches exactly the same strings, so searches give the same yes/no answers; it is NOT used
+    # for findall counts, where the keyword order decides which of two overlapping matches wins.
+    keywords = pattern.split("|")
+    if any(ch in REGEX_METACHARACTERS for ch in pattern) or not all(keywords):
+        return pattern
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+def compile_language_patterns(patterns):
+    # Everything analyze_text_complexity needs for one language, compiled once
+    return {
+        "word_boundary": re.compile(patterns["word_boundary"]),
+        "sentence_endings": re.compile(patterns["sentence_endings"]),
+        "syllable_pattern": re.compile(patterns["syllable_pattern"]) if "syllable_pattern" in patterns else None,
+        # counted with findall, so compiled as written to keep the counts identical
+        "cultural_references": re.compile(patterns["cultural_references"], re.IGNORECASE),
+        "complex_structures": re.compile(patterns["complex_structures"], re.IGNORECASE),
+        # only ever searched, so the trie form is safe
+        "complex_words": re.compile(keyword_trie_regex(patterns["complex_words"]), re.IGNORECASE),
+        "abstract_concepts": re.compile(keyword_trie_regex(patterns["abstract_concepts"]), re.IGNORECASE),
+        "emotional_content": re.compile(keyword_trie_regex(patterns["emotional_content"]), re.IGNORECASE),
+        "scientific_terms": re.compile(keyword_trie_regex(patterns["scientific_terms"]), re.IGNORECASE),
+        "opinion_indicators": re.compile(keyword_trie_regex(patterns["opinion_indicators"]), re.IGNORECASE),
+        # word -> contains a complex-word keyword, most words repeat across lines
+        "word_cache": {},
+    }
+
+def get_compiled_patterns(language_code):
+    compiled = _compiled_patterns.get(language_code)
+    if compiled is None:
+        patterns = language_patterns.get(language_code, language_patterns["ms"])  # Default to Malay if not found
+        compiled = _compiled_patterns[language_code] = compile_language_patterns(patterns)
+    return compiled
+
+def count_complex_words(words, compiled, min_length=None):
+    # words longer than min_length (when given) or containing a complex-word keyword, memoized per word
+    cache = compiled["word_cache"]
+    complex_words = compiled["complex_words"]
+    count = 0
+    for word in words:
+        if min_length is not None and len(word) > min_length:
+            count += 1
+            continue
+        is_complex = cache.get(word)
+        if is_complex is None:
+            if len(cache) >= WORD_CACHE_SIZE:
+                cache.clear()
+            is_complex = cache[word] = complex_words.search(word) is not None
+        count += is_complex
+    return count
+
 # Helper function to analyze text complexity based on language
 def analyze_text_complexity(text, language_code):
-    # Get the appropriate patterns for the language
-    patterns = language_patterns.get(language_code, language_patterns["ms"])  # Default to Malay if not found
+    # Get the appropriate patterns for the language, compiled once per language
+    patterns = get_compiled_patterns(language_code)
     
     # Basic text metrics
-    words = re.split(patterns["word_boundary"], text)
+    words = patterns["word_boundary"].split(text)
     words = [w for w in words if w]  # Filter out empty strings
     word_count = len(words)
     
-    sentence_endings = re.findall(patterns["sentence_endings"], text)
+    sentence_endings = patterns["sentence_endings"].findall(text)
     sentence_count = len(sentence_endings) if sentence_endings else 1
     avg_words_per_sentence = word_count / sentence_count
     
+    # Cultural references and grammatical structures are counted; the counts also answer
+    # "contains ...", so those two categories are scanned once instead of twice
+    cultural_reference_matches = len(patterns["cultural_references"].findall(text))
+    structure_matches = len(patterns["complex_structures"].findall(text))
+    
+    # Content categories only need a yes/no
+    contains_abstract_concepts = patterns["abstract_concepts"].search(text) is not None
+    contains_emotional_content = patterns["emotional_content"].search(text) is not None
+    contains_scientific_terms = patterns["scientific_terms"].search(text) is not None
+    contains_opinion = patterns["opinion_indicators"].search(text) is not None
+    
     # Language-specific analysis
     complex_words_count = 0
     syllable_count = 0
     
     if language_code == "ta":
         # For Tamil, use syllable counting and pattern matching
-        syllables = re.findall(patterns["syllable_pattern"], text)
+        syllables = patterns["syllable_pattern"].findall(text)
         syllable_count = len(syllables) if syllables else 0
         
         # Count complex words using our patterns
-        complex_words_count = sum(1 for word in words if re.search(patterns["complex_words"], word, re.IGNORECASE))
-        
-        # Tamil cultural references add complexity
-        cultural_reference_matches = len(re.findall(patterns["cultural_references"], text, re.IGNORECASE))
-        
-        # Add complexity for Tamil-specific grammatical structures
-        structure_matches = len(re.findall(patterns["complex_structures"], text, re.IGNORECASE))
+        complex_words_count = count_complex_words(words, patterns)
         
         # Combined score
         complexity_score = {
@@ -240,26 +334,20 @@ def analyze_text_complexity(text, language_code):
             "complex_words_count": complex_words_count,
             "complexity_ratio": complex_words_count / word_count if word_count else 0,
             "syllable_ratio": syllable_count / word_count if word_count else 0,
-            "contains_abstract_concepts": bool(re.search(patterns["abstract_concepts"], text, re.IGNORECASE)),
+            "contains_abstract_concepts": contains_abstract_concepts,
             "contains_factual_content": len(text) > 50,
-            "contains_emotional_content": bool(re.search(patterns["emotional_content"], text, re.IGNORECASE)),
-            "contains_scientific_terms": bool(re.search(patterns["scientific_terms"], text, re.IGNORECASE)),
-            "contains_opinion": bool(re.search(patterns["opinion_indicators"], text, re.IGNORECASE)),
-            "contains_complex_structures": bool(re.search(patterns["complex_structures"], text, re.IGNORECASE)),
-            "contains_cultural_references": bool(re.search(patterns["cultural_references"], text, re.IGNORECASE)),
+            "contains_emotional_content": contains_emotional_content,
+            "contains_scientific_terms": contains_scientific_terms,
+            "contains_opinion": contains_opinion,
+            "contains_complex_structures": structure_matches > 0,
+            "contains_cultural_references": cultural_reference_matches > 0,
             "cultural_reference_count": cultural_reference_matches,
             "structural_complexity_count": structure_matches,
             "complexity_score": complexity_score
         }
     else:
         # For Tajik and Malay
-        complex_words_count = sum(1 for word in words if len(word) > 6 or re.search(patterns["complex_words"], word, re.IGNORECASE))
-        
-        # Count cultural references
-        cultural_reference_matches = len(re.findall(patterns["cultural_references"], text, re.IGNORECASE))
-        
-        # Add complexity for specific grammatical structures
-        structure_matches = len(re.findall(patterns["complex_structures"], text, re.IGNORECASE))
+        complex_words_count = count_complex_words(words, patterns, min_length=6)
         
         return {
             "word_count": word_count,
@@ -267,13 +355,13 @@ def analyze_text_complexity(text, language_code):
             "avg_words_per_sentence": avg_words_per_sentence,
             "complex_words_count": complex_words_count,
             "complexity_ratio": complex_words_count / word_count if word_count else 0,
-            "contains_abstract_concepts": bool(re.search(patterns["abstract_concepts"], text, re.IGNORECASE)),
+            "contains_abstract_concepts": contains_abstract_concepts,
             "contains_factual_content": len(text) > 50,
-            "contains_emotional_content": bool(re.search(patterns["emotional_content"], text, re.IGNORECASE)),
-            "contains_scientific_terms": bool(re.search(patterns["scientific_terms"], text, re.IGNORECASE)),
-            "contains_opinion": bool(re.search(patterns["opinion_indicators"], text, re.IGNORECASE)),
-            "contains_complex_structures": bool(re.search(patterns["complex_structures"], text, re.IGNORECASE)),
-            "contains_cultural_references": bool(re.search(patterns["cultural_references"], text, re.IGNORECASE)),
+            "contains_emotional_content": contains_emotional_content,
+            "contains_scientific_terms": contains_scientific_terms,
+            "contains_opinion": contains_opinion,
+            "contains_complex_structures": structure_matches > 0,
+            "contains_cultural_references": cultural_reference_matches > 0,
             "cultural_reference_count": cultural_reference_matches,
             "structural_complexity_count": structure_matches
         }
@@ -419,60 +507,166 @@ def get_language_pair(filename):
     else:
         return {"source": "English", "target": "Unknown", "code": "unknown"}
 
+def label_line(line, language_code):
+    # "source\ttarget\tilr" for one input line, None for a blank line, False if it has no tab
+    if not line.strip():
+        return None
+    
+    # Split the line into source and target
+    parts = line.split('\t')
+    if len(parts) < 2:
+        return False
+    
+    source, target = parts[0], parts[1]
+    
+    # Analyze the target text based on the language
+    ilr_level = suggest_ilr_level(target, language_code)
+    return f"{source}\t{target}\t{ilr_level}\n"
+
+def split_into_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    # (start, end) byte ranges of about chunk_size bytes, each ending right after a newline
+    file_size = os.path.getsize(file_path)
+    chunks = []
+    with open(file_path, 'rb') as file:
+        start = 0
+        while start < file_size:
+            file.seek(min(start + chunk_size, file_size))
+            file.readline()  # move on to the end of the line the cut fell in
+            end = min(file.tell(), file_size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def label_chunk(input_file_path, start, end, language_code):
+    # Worker side of parallel mode: labels the lines in one byte range of the file.
+    # Returns (output text, non-empty line count, [(index among non-empty lines, line)] without a tab,
+    # newline count)
+    with open(input_file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # same newline handling as reading the file in text mode
+    text = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    
+    output_lines = []
+    malformed = []
+    line_count = 0
+    for line in text.split('\n'):
+        labeled = label_line(line, language_code)
+        if labeled is None:
+            continue
+        line_count += 1
+        if labeled is False:
+            malformed.append((line_count, line))
+            continue
+        output_lines.append(labeled)
+    return "".join(output_lines), line_count, malformed, text.count('\n')
+
+def log_progress(filename, line_count, start_time):
+    elapsed = time.perf_counter() - start_time
+    print(f"  {filename}: {line_count:,} lines labeled in {elapsed:.0f}s "
+          f"({line_count / elapsed if elapsed else 0:,.0f} lines/sec)")
+
 # Function to process a translation file
-def process_translation_file(input_file_path, output_file_path):
+def process_translation_file(input_file_path, output_file_path, executor=None, workers=1,
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+    # Output goes to output_file_path + ".tmp" and is renamed over output_file_path once the whole
+    # file is labeled, so an interrupted run never leaves a truncated rated_ file behind
+    temp_path = output_file_path + ".tmp"
     try:
         # Determine language pair from filename
         filename = os.path.basename(input_file_path)
         language_pair = get_language_pair(filename)
         
         print(f"Processing {language_pair['source']}-{language_pair['target']} file: {filename}")
+        start_time = time.perf_counter()
         
-        # Read the file content
-        with open(input_file_path, 'r', encoding='utf-8') as file:
-            file_content = file.read()
-        
-        lines = file_content.split('\n')
-        print(f"File {input_file_path} has {len(lines)} total lines")
-        
-        # Prepare output content
-        output_content = ""
-        line_count = 0
+        with open(temp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as output:
+            if executor is not None:
+                line_count = process_translation_file_parallel(input_file_path, output, language_pair,
+                                                               executor, workers, chunk_size)
+            else:
+                line_count = process_translation_file_streaming(input_file_path, output, language_pair)
+        os.replace(temp_path, output_file_path)
         
+        elapsed = time.perf_counter() - start_time
+        print(f"Processed {line_count} lines. Output saved to {output_file_path}")
+        return {"line_count": line_count, "language_pair": language_pair, "seconds": elapsed}
+    
+    except Exception as error:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        print(f"Error processing file {input_file_path}: {error}")
+        raise error
+
+def process_translation_file_streaming(input_file_path, output, language_pair):
+    # Reads, labels and writes one line at a time, so memory use doesn't grow with the file
+    filename = os.path.basename(input_file_path)
+    start_time = time.perf_counter()
+    next_log = start_time + PROGRESS_INTERVAL
+    newline_count = 0
+    line_count = 0
+    
+    with open(input_file_path, 'r', encoding='utf-8') as file:
         # Process each line
-        for line in lines:
-            if not line.strip():
+        for line in file:
+            if line.endswith('\n'):
+                newline_count += 1
+                line = line[:-1]
+            
+            labeled = label_line(line, language_pair["code"])
+            if labeled is None:
                 continue
             
             line_count += 1
             
-            # Split the line into source and target
-            parts = line.split('\t')
-            if len(parts) < 2:
+            if labeled is False:
                 print(f"Line {line_count} doesn't have proper format (source\\ttarget): {line}")
                 continue
             
-            source, target = parts[0], parts[1]
-            
-            # Analyze the target text based on the language
-            ilr_level = suggest_ilr_level(target, language_pair["code"])
-            
             # Write the line with ILR rating on the same line
-            output_content += f"{source}\t{target}\t{ilr_level}\n"
-        
-        # Write the output file
-        with open(output_file_path, 'w', encoding='utf-8') as file:
-            file.write(output_content)
-        
-        print(f"Processed {line_count} lines. Output saved to {output_file_path}")
-        return {"line_count": line_count, "language_pair": language_pair}
+            output.write(labeled)
+            
+            if line_count % 1000 == 0 and time.perf_counter() >= next_log:
+                log_progress(filename, line_count, start_time)
+                next_log = time.perf_counter() + PROGRESS_INTERVAL
     
-    except Exception as error:
-        print(f"Error processing file {input_file_path}: {error}")
-        raise error
+    # counted the way the whole-file split('\n') used to count them
+    print(f"File {input_file_path} has {newline_count + 1} total lines")
+    return line_count
+
+def process_translation_file_parallel(input_file_path, output, language_pair, executor, workers,
+                                      chunk_size=DEFAULT_CHUNK_SIZE):
+    # Labels the file's chunks in the worker processes and writes them back in file order.
+    # At most a few chunks per worker are in flight, so memory stays bounded on big files.
+    filename = os.path.basename(input_file_path)
+    start_time = time.perf_counter()
+    next_log = start_time + PROGRESS_INTERVAL
+    chunks = split_into_chunks(input_file_path, chunk_size)
+    pending = deque()
+    next_chunk = 0
+    line_count = 0
+    newline_count = 0
+    while next_chunk < len(chunks) or pending:
+        while next_chunk < len(chunks) and len(pending) < workers * 2:
+            start, end = chunks[next_chunk]
+            pending.append(executor.submit(label_chunk, input_file_path, start, end, language_pair["code"]))
+            next_chunk += 1
+        output_content, chunk_line_count, malformed, chunk_newline_count = pending.popleft().result()
+        for index, line in malformed:
+            print(f"Line {line_count + index} doesn't have proper format (source\\ttarget): {line}")
+        line_count += chunk_line_count
+        newline_count += chunk_newline_count
+        output.write(output_content)
+        if time.perf_counter() >= next_log:
+            log_progress(filename, line_count, start_time)
+            next_log = time.perf_counter() + PROGRESS_INTERVAL
+    # the same total as the streaming path, from the chunks' newline counts
+    print(f"File {input_file_path} has {newline_count + 1} total lines")
+    print(f"File {input_file_path} split into {len(chunks)} chunks for {workers} workers")
+    return line_count
 
 # Main function to process all files in a directory
-def process_all_files(input_dir, output_dir):
+def process_all_files(input_dir, output_dir, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     try:
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
@@ -487,13 +681,22 @@ def process_all_files(input_dir, output_dir):
         
         print(f"Found {len(aligned_files)} aligned text files to process")
         
+        # With more than one worker, every file is split into line-aligned chunks labeled by a process pool
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        
         # Process each file
         results = []
-        for file in aligned_files:
-            input_path = os.path.join(input_dir, file)
-            output_path = os.path.join(output_dir, f"rated_{file}")
-            result = process_translation_file(input_path, output_path)
-            results.append({"file": file, **result})
+        start_time = time.perf_counter()
+        try:
+            for file in aligned_files:
+                input_path = os.path.join(input_dir, file)
+                output_path = os.path.join(output_dir, f"rated_{file}")
+                result = process_translation_file(input_path, output_path, executor, workers, chunk_size)
+                results.append({"file": file, **result})
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        elapsed = time.perf_counter() - start_time
         
         # Print summary
         print("\nProcessing Summary:")
@@ -507,6 +710,21 @@ def process_all_files(input_dir, output_dir):
         print("=" * 60)
         print(f"Total files processed: {len(results)}")
         print(f"Total lines processed: {sum(r['line_count'] for r in results)}")
+        
+        # Print throughput
+        print(f"\nThroughput ({workers} worker{'s' if workers > 1 else ''}):")
+        print("=" * 60)
+        print("File\t\tSeconds\tLines/sec")
+        print("-" * 60)
+        
+        for result in results:
+            lines_per_second = result['line_count'] / result['seconds'] if result['seconds'] else 0
+            print(f"{result['file']}\t{result['seconds']:.1f}\t{lines_per_second:,.0f}")
+        
+        total_lines = sum(r['line_count'] for r in results)
+        print("=" * 60)
+        print(f"Total: {elapsed:.1f}s, {total_lines / elapsed if elapsed else 0:,.0f} lines/sec")
+        return results
     
     except Exception as error:
         print(f"Error processing files: {error}")
@@ -560,13 +778,13 @@ def create_sample_files():
         print(f'Error creating sample files: {error}')
 
 # Run the example
-def run_example():
+def run_example(workers=1):
     try:
         # Create sample files
         create_sample_files()
         
         # Process all files
-        process_all_files('./input', './output')
+        process_all_files('./input', './output', workers)
         
         # Display the results
         print("\nSample Output Content:")
@@ -584,16 +802,17 @@ def run_example():
 
 # If this script is run directly (not imported)
 if __name__ == "__main__":
-    import sys
-    
-    # Check for command line arguments
-    args = sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Add an ILR level to every line of the aligned files")
+    parser.add_argument("input_dir", nargs="?", help="directory with the *_aligned.txt files")
+    parser.add_argument("output_dir", nargs="?", help="where the rated_ files are written")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes labeling chunks of each file in parallel (1 = label in this process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="bytes of input per worker chunk")
+    args = parser.parse_args()
     
-    if len(args) >= 2:
+    if args.input_dir and args.output_dir:
         # If input and output directories are provided as arguments
-        input_dir = args[0]
-        output_dir = args[1]
-        process_all_files(input_dir, output_dir)
+        process_all_files(args.input_dir, args.output_dir, args.workers, args.chunk_size)
     else:
         # Run the example with sample files
-        run_example()
\ No newline at end of file
+        run_example(args.workers)
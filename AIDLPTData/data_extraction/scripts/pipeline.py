@@ -0,0 +1,364 @@
+import io
+import os
+import time
+import queue
+import tempfile
+import zipfile
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+
+import clean_data
+import extract_data
+import label_data
+import process_data
+import store_data
+
+# Aligned lines per batch handed from one stage to the next
+DEFAULT_BATCH_LINES = 2000
+
+# Batches each queue between two stages may hold before the stage in front of it waits
+DEFAULT_QUEUE_SIZE = 16
+
+# Seconds between progress lines
+REPORT_INTERVAL = 10.0
+
+# Bytes of aligned text a pair is held in memory for, in non-tolerant mode, before spilling to disk
+SPOOL_SIZE = 64 << 20
+
+# Marks the end of a stage's output in the queue after it
+DONE = object()
+
+class PipelineAborted(Exception):
+    pass
+
+def label_batch(lang_code, lines):
+    # Label-stage worker: aligned "en\ttgt" lines -> text_data rows, through the same
+    # label_data / store_data functions the file-based scripts use, so the rows come out identical
+    rows = []
+    for line in lines:
+        labeled = label_data.label_line(line, lang_code)
+        if not labeled:
+            continue
+        parsed = store_data.parse_aligned_line(labeled.strip())
+        if parsed is not None:
+            rows.append((lang_code, *parsed))
+    return rows
+
+class BatchWriter:
+    """File-like target for clean_data.align_streams that hands its lines on in batches."""
+
+    def __init__(self, send, batch_lines):
+        self.send = send
+        self.batch_lines = batch_lines
+        self.batch = []
+
+    def write(self, line):
+        self.batch.append(line.rstrip("\n"))
+        if len(self.batch) >= self.batch_lines:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.send(self.batch)
+            self.batch = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+class StageStats:
+    """Item counts and timings for one stage, updated from its threads."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.first_at = None
+        self._lock = threading.Lock()
+
+    def add(self, items):
+        with self._lock:
+            if self.first_at is None:
+                self.first_at = time.perf_counter()
+            self.items += items
+            self.batches += 1
+
+class Pipeline:
+    """archive -> aligned pair -> ILR label -> COPY into text_data, as concurrent stages.
+
+    Each stage passes batches of lines to the next through a bounded queue, so the first rows
+    reach the database while the archives are still being read, and a slow stage holds up the
+    ones in front of it instead of letting batches pile up in memory.
+      - read:  read_workers threads, each streaming one archive's member pairs at a time
+               (optionally downloading the dataset first)
+      - label: label_workers processes running suggest_ilr_level, results kept in order
+      - load:  load_workers threads, each with its own connection, COPYing through the staging
+               table like store_data.py; sink="null" counts the rows and drops them instead
+    """
+
+    def __init__(self, database_url=store_data.DATABASE_URL, read_workers=1, label_workers=1, load_workers=1,
+                 batch_lines=DEFAULT_BATCH_LINES, queue_size=DEFAULT_QUEUE_SIZE, tolerant=False,
+                 report_interval=REPORT_INTERVAL, sink="postgres"):
+        self.database_url = database_url
+        self.read_workers = read_workers
+        self.label_workers = label_workers
+        self.load_workers = load_workers
+        self.batch_lines = batch_lines
+        self.tolerant = tolerant
+        self.report_interval = report_interval
+        self.sink = sink
+        self.aligned = queue.Queue(maxsize=queue_size)
+        self.labeled = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(name) for name in ("read", "label", "load")}
+        self.new_rows = 0
+        self.errors = []
+        self._failed = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- queue helpers: never block forever once another stage has failed
+
+    def _put(self, q, item):
+        while True:
+            if self._failed.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._failed.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except Exception as error:
+            with self._lock:
+                self.errors.append(error)
+            self._failed.set()
+            print(f"❌ Pipeline stage {threading.current_thread().name} failed: {error}")
+
+    # --- read stage
+
+    def read_pair(self, zip_ref, label, lang_code, en_name, tgt_name):
+        def open_member(name):
+            return io.TextIOWrapper(zip_ref.open(name), encoding="utf-8", errors="replace")
+
+        def send(batch):
+            self._put(self.aligned, (lang_code, batch))
+            self.stats["read"].add(len(batch))
+
+        tgt_label = f"{label}:{tgt_name}"
+        with open_member(en_name) as en_f, open_member(tgt_name) as tgt_f:
+            if self.tolerant:
+                # the aligned prefix is kept whatever follows, so it streams on as it is read
+                with BatchWriter(send, self.batch_lines) as out_f:
+                    result = clean_data.align_streams(en_f, tgt_f, out_f)
+                if result["divergence"] is not None:
+                    print(f"⚠️ Mismatch in line count: {result['en_lines']} EN ↔ {result['tgt_lines']} "
+                          f"{tgt_label}, first divergence at line {result['divergence']}, "
+                          f"keeping the {result['aligned']} aligned lines")
+                return
+            # the file-based flow drops a pair whose line counts differ, which is only known once
+            # both members are read, so the pair is spooled (to disk past SPOOL_SIZE) and sent after
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode="w+", encoding="utf-8") as spool:
+                result = clean_data.align_streams(en_f, tgt_f, spool)
+                if result["divergence"] is not None:
+                    print(f"Mismatch in line count: {result['en_lines']} EN ↔ {result['tgt_lines']} {tgt_label}, "
+                          f"skipping...")
+                    return
+                spool.seek(0)
+                with BatchWriter(send, self.batch_lines) as out_f:
+                    for line in spool:
+                        out_f.write(line)
+
+    def read_archive(self, zip_path):
+        label = os.path.basename(zip_path)
+        try:
+            with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                pairs = process_data.member_pairs(zip_ref)
+                if not pairs:
+                    print(f"No matching files found in {label}, skipping...")
+                for lang_code, en_name, tgt_name in pairs:
+                    print(f"Processing {label}:{en_name} ↔ {tgt_name}...")
+                    self.read_pair(zip_ref, label, lang_code, en_name, tgt_name)
+        except zipfile.BadZipFile:
+            print(f"❌ Error: The file {label} is not a valid ZIP file.")
+
+    def _reader(self, sources, download_dir, api_url):
+        while True:
+            try:
+                source = sources.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(source, dict):
+                # a dataset entry: download (or find the verified copy) first
+                result = extract_data.download_opus_data(source, download_dir, self.manifest, api_url)
+                if result["status"] == "failed":
+                    continue
+                source = os.path.join(download_dir, result["file"])
+            self.read_archive(source)
+        self._put(self.aligned, DONE)
+
+    # --- label stage
+
+    def _labeler(self):
+        executor = ProcessPoolExecutor(max_workers=self.label_workers) if self.label_workers > 1 else None
+        pending = deque()
+        readers_left = self.read_workers
+
+        def emit(rows):
+            self._put(self.labeled, rows)
+            self.stats["label"].add(len(rows))
+
+        try:
+            while readers_left:
+                item = self._get(self.aligned)
+                if item is DONE:
+                    readers_left -= 1
+                    continue
+                lang_code, lines = item
+                if executor is None:
+                    emit(label_batch(lang_code, lines))
+                    continue
+                pending.append(executor.submit(label_batch, lang_code, lines))
+                # keep every worker busy, but hand batches on in the order they were read
+                while pending and (pending[0].done() or len(pending) >= self.label_workers * 2):
+                    emit(pending.popleft().result())
+            while pending:
+                emit(pending.popleft().result())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        for _ in range(self.load_workers):
+            self._put(self.labeled, DONE)
+
+    # --- load stage
+
+    def _loader(self):
+        if self.sink == "null":
+            while (rows := self._get(self.labeled)) is not DONE:
+                self.stats["load"].add(len(rows))
+            return
+
+        conn = psycopg2.connect(self.database_url)
+        cursor = conn.cursor()
+        try:
+            store_data.create_staging_table(cursor)
+            conn.commit()
+            while (rows := self._get(self.labeled)) is not DONE:
+                if not rows:
+                    continue
+                inserted = store_data.insert_batch(cursor, rows)
+                conn.commit()
+                with self._lock:
+                    self.new_rows += inserted
+                self.stats["load"].add(len(rows))
+        finally:
+            cursor.close()
+            conn.close()
+
+    # --- reporting
+
+    def _reporter(self, start):
+        while not self._finished.wait(self.report_interval):
+            self.report(start)
+
+    def report(self, start):
+        elapsed = time.perf_counter() - start
+        parts = []
+        for name, backlog in (("read", None), ("label", self.aligned), ("load", self.labeled)):
+            stats = self.stats[name]
+            part = f"{name} {stats.items:,} ({stats.items / elapsed if elapsed else 0:,.0f}/s)"
+            if backlog is not None:
+                part += f" backlog {backlog.qsize()}"
+            parts.append(part)
+        print(f"[{elapsed:.0f}s] " + " | ".join(parts))
+
+    def run(self, zip_paths=(), datasets=(), download_dir=extract_data.download_dir,
+            api_url=extract_data.OPUS_API_URL):
+        # zip_paths are read as they are; datasets (extract_data.py entries) are downloaded first
+        sources = queue.Queue()
+        for source in list(datasets) + list(zip_paths):
+            sources.put(source)
+        self.manifest = None
+        if datasets:
+            os.makedirs(download_dir, exist_ok=True)
+            self.manifest = extract_data.DownloadManifest(download_dir)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._guard, args=(self._reader, sources, download_dir, api_url),
+                                    name=f"read-{i}") for i in range(self.read_workers)]
+        threads.append(threading.Thread(target=self._guard, args=(self._labeler,), name="label"))
+        threads += [threading.Thread(target=self._guard, args=(self._loader,), name=f"load-{i}")
+                    for i in range(self.load_workers)]
+        reporter = threading.Thread(target=self._reporter, args=(start,), name="report", daemon=True)
+        for thread in threads:
+            thread.start()
+        reporter.start()
+        for thread in threads:
+            thread.join()
+        self._finished.set()
+        elapsed = time.perf_counter() - start
+
+        self.report(start)
+        if self.errors:
+            raise self.errors[0]
+
+        loaded = self.stats["load"]
+        first_row = f"{loaded.first_at - start:.1f}s" if loaded.first_at else "-"
+        print(f"\nPipeline finished in {elapsed:.1f}s: {self.stats['read'].items:,} aligned lines, "
+              f"{loaded.items:,} rows loaded ({self.new_rows:,} new), first rows after {first_row}")
+        return {
+            "seconds": elapsed,
+            "first_row_seconds": loaded.first_at - start if loaded.first_at else None,
+            **{f"{name}_items": stats.items for name, stats in self.stats.items()},
+            "new_rows": self.new_rows,
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream OPUS archives through alignment and ILR labeling into text_data, without intermediate files")
+    parser.add_argument("--download-dir", default=process_data.download_dir, help="directory with the OPUS ZIP files")
+    parser.add_argument("--download", action="store_true",
+                        help="download the datasets in --config first (skipping verified ones) instead of "
+                             "reading whatever is in --download-dir")
+    parser.add_argument("--config", default=extract_data.DATASETS_CONFIG)
+    parser.add_argument("--opus-api", default=extract_data.OPUS_API_URL)
+    parser.add_argument("--read-workers", type=int, default=1, help="archives read at the same time")
+    parser.add_argument("--label-workers", type=int, default=1, help="processes running the ILR labeling")
+    parser.add_argument("--load-workers", type=int, default=1, help="database connections loading batches")
+    parser.add_argument("--batch-lines", type=int, default=DEFAULT_BATCH_LINES)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="batches buffered between stages")
+    parser.add_argument("--tolerant", action="store_true", help="see clean_data.py --tolerant")
+    parser.add_argument("--sink", choices=["postgres", "null"], default="postgres",
+                        help="null: count the labeled rows instead of loading them")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL)
+    args = parser.parse_args()
+
+    pipeline = Pipeline(store_data.DATABASE_URL, args.read_workers, args.label_workers, args.load_workers,
+                        args.batch_lines, args.queue_size, args.tolerant, args.report_interval, args.sink)
+    if args.download:
+        pipeline.run(datasets=extract_data.load_datasets(args.config), download_dir=args.download_dir,
+                     api_url=args.opus_api)
+    else:
+        zip_paths = [os.path.join(args.download_dir, file) for file in sorted(os.listdir(args.download_dir))
+                     if file.endswith(".zip")]
+        pipeline.run(zip_paths)
@@ -1,30 +1,121 @@
+import io
 import os
+import argparse
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import clean_data
 
 # Define the directory where ZIP files are stored
 download_dir = os.path.abspath("data/raw_opus")
 extract_dir = os.path.abspath("data/extracted_opus")
 
-# Ensure the extraction directory exists
-os.makedirs(extract_dir, exist_ok=True)
+def is_wanted_member(name, target_languages=clean_data.target_languages):
+    # only the .en-xx.en / .en-xx.xx sentence files are used downstream, not the XML, ids or README
+    return any(name.endswith((f".en-{lang_code}.en", f".en-{lang_code}.{lang_code}")) for lang_code in target_languages)
 
-# Loop through all ZIP files in the download directory
-for file in os.listdir(download_dir):
-    if file.endswith(".zip"):
-        zip_path = os.path.join(download_dir, file)
-        try:
-            # Open and extract the ZIP file
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_dir)
-                print(f"✅ Extracted: {file}")
-            
-            # Delete the ZIP file after successful extraction
+def member_pairs(zip_ref, target_languages=clean_data.target_languages):
+    # (lang_code, English member, target member) for every language pair in the archive
+    names = set(zip_ref.namelist())
+    pairs = []
+    for name in sorted(names):
+        for lang_code in target_languages:
+            if name.endswith(f".en-{lang_code}.en"):
+                tgt_name = name[:-len("en")] + lang_code
+                if tgt_name in names:
+                    pairs.append((lang_code, name, tgt_name))
+    return pairs
+
+def extract_archive(zip_path, extract_dir=extract_dir, delete_archive=False):
+    # Extract the wanted members of one ZIP file, returns how many were written
+    file = os.path.basename(zip_path)
+    try:
+        # Open and extract the ZIP file
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            members = [name for name in zip_ref.namelist() if is_wanted_member(name)]
+            for member in members:
+                zip_ref.extract(member, extract_dir)
+            print(f"✅ Extracted: {file} ({len(members)} of {len(zip_ref.namelist())} members)")
+
+        # Delete the ZIP file after successful extraction, only when asked: extract_data.py skips
+        # archives that are already downloaded, which only works while they are still there
+        if delete_archive:
             os.remove(zip_path)
             print(f"🗑️ Deleted: {file}")
-        
+        return len(members)
+
+    except zipfile.BadZipFile:
+        print(f"❌ Error: The file {file} is not a valid ZIP file.")
+    except Exception as e:
+        print(f"❌ Error extracting or deleting {file}: {e}")
+    return 0
+
+def stream_archive(zip_path, output_dir=clean_data.output_dir, tolerant=False):
+    # Feed the sentence members of one ZIP file straight into the aligner, nothing is extracted to disk
+    file = os.path.basename(zip_path)
+    results = []
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for lang_code, en_name, tgt_name in member_pairs(zip_ref):
+                output_file = os.path.join(output_dir, clean_data.aligned_output_name(en_name))
+                print(f"Processing {file}:{en_name} ↔ {tgt_name}...")
+                with io.TextIOWrapper(zip_ref.open(en_name), encoding="utf-8", errors="replace") as en_f, \
+                        io.TextIOWrapper(zip_ref.open(tgt_name), encoding="utf-8", errors="replace") as tgt_f:
+                    results.append(clean_data.write_aligned(en_f, tgt_f, output_file, f"{file}:{tgt_name}", tolerant))
+            if not results:
+                print(f"No matching files found in {file}, skipping...")
+
+    except zipfile.BadZipFile:
+        print(f"❌ Error: The file {file} is not a valid ZIP file.")
+    except Exception as e:
+        print(f"❌ Error aligning {file}: {e}")
+    return results
+
+def stream_outputs(zip_paths, output_dir=clean_data.output_dir):
+    # (output_file, source) for every member pair stream_archive would align, from the archive directories only
+    outputs = []
+    for zip_path in zip_paths:
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                outputs += [(os.path.join(output_dir, clean_data.aligned_output_name(en_name)),
+                             f"{os.path.basename(zip_path)}:{en_name}") for _, en_name, _ in member_pairs(zip_ref)]
         except zipfile.BadZipFile:
-            print(f"❌ Error: The file {file} is not a valid ZIP file.")
-        except Exception as e:
-            print(f"❌ Error extracting or deleting {file}: {e}")
+            pass  # reported by stream_archive
+    return outputs
+
+def main(download_dir=download_dir, extract_dir=extract_dir, workers=1, stream=False, delete_archives=False,
+         output_dir=clean_data.output_dir, tolerant=False):
+    # Loop through all ZIP files in the download directory, several at once when workers > 1
+    zip_paths = [os.path.join(download_dir, file) for file in sorted(os.listdir(download_dir)) if file.endswith(".zip")]
+
+    if stream:
+        os.makedirs(output_dir, exist_ok=True)
+        clean_data.check_unique_outputs(stream_outputs(zip_paths, output_dir))
+        task, args = stream_archive, (output_dir, tolerant)
+    else:
+        # Ensure the extraction directory exists
+        os.makedirs(extract_dir, exist_ok=True)
+        task, args = extract_archive, (extract_dir, delete_archives)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(task, zip_paths, *[[arg] * len(zip_paths) for arg in args]))
+    else:
+        results = [task(zip_path, *args) for zip_path in zip_paths]
+
+    print("🎯 All ZIP files processed successfully!")
+    return results
 
-print("🎯 All ZIP files processed successfully!")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the sentence files from the downloaded OPUS archives")
+    parser.add_argument("--download-dir", default=download_dir)
+    parser.add_argument("--extract-dir", default=extract_dir)
+    parser.add_argument("--workers", type=int, default=1, help="archives processed in parallel")
+    parser.add_argument("--delete-archives", action="store_true", help="remove each ZIP file once it is extracted")
+    parser.add_argument("--stream", action="store_true",
+                        help="align straight from the archives into --output-dir instead of extracting")
+    parser.add_argument("--output-dir", default=clean_data.output_dir, help="aligned files, with --stream")
+    parser.add_argument("--tolerant", action="store_true", help="with --stream, see clean_data.py --tolerant")
+    args = parser.parse_args()
+    main(args.download_dir, args.extract_dir, args.workers, args.stream, args.delete_archives,
+         args.output_dir, args.tolerant)
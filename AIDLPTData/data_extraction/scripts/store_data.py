@@ -1,5 +1,10 @@
 import os
+import io
+import time
+import hashlib
+import argparse
 import psycopg2
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -7,52 +12,287 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-def store_data():
-    # Connect to the PostgreSQL database
-    conn = psycopg2.connect(DATABASE_URL)
-    cursor = conn.cursor()
+# Define the directory containing processed files
+PROCESSED_DIR = os.path.abspath("data/rated_opus")
 
-    # Define the directory containing processed files
-    processed_dir = os.path.abspath("data/rated_opus")
+# Rows per COPY batch (and per commit) in copy mode
+DEFAULT_BATCH_SIZE = 50000
 
-    # Step 1: Loop through the processed .txt files
+TEXT_DATA_COLUMNS = "language, english_text, translated_text, ilr_level"
+
+# Read size when hashing files for the ingest manifest
+HASH_CHUNK_SIZE = 1 << 20
+
+def find_aligned_files(processed_dir=PROCESSED_DIR):
+    # (file_path, lang_code) for every rated _aligned.txt file
+    aligned_files = []
     for root, dirs, files in os.walk(processed_dir):
         for file in files:
             if file.endswith("_aligned.txt"):  # Process only aligned text files
-                lang_code = file.split("-")[1].split("_")[0]  # Extract language code from the filename
-                file_path = os.path.join(root, file)
-
-                # Step 2: Read the aligned sentences
-                with open(file_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        line = line.strip()  # Remove leading/trailing whitespace
-                        if not line:  # Skip empty lines
-                            continue
-
-                        # Check if the line contains exactly two parts separated by a tab and the ILR rating at the end
-                        if "\t" in line:
-                            parts = line.rsplit("\t", 2)  # Split into original text, translated text, and ILR rating
-                            if len(parts) == 3:
-                                original_text, translated_text, ilr_rating = parts
-                                # Clean up and extract ILR rating (strip spaces)
-                                ilr_rating = ilr_rating.strip()  # Keep it as a string, e.g., "1+", "2", etc.
-                                
-                                # Step 3: Insert original, translated text, and ILR rating into the database
-                                cursor.execute("""
-                                    INSERT INTO text_data (language, english_text, translated_text, ilr_level)
-                                    VALUES (%s, %s, %s, %s)
-                                """, (lang_code, original_text, translated_text, ilr_rating))
-                            else:
-                                print(f"⚠️ Skipping malformed line in {file_path}: {line}")
-                        else:
-                            print(f"⚠️ Skipping malformed line in {file_path}: {line}")
-
-                print(f"✅ Processed {file_path} and inserted data into the database.")
+                # Extract language code from the filename ("rated_<corpus>.en-xx_aligned.txt")
+                lang_code = file[:-len("_aligned.txt")].rsplit("-", 1)[1]
+                aligned_files.append((os.path.join(root, file), lang_code))
+    return aligned_files
+
+def parse_aligned_line(line):
+    # (original_text, translated_text, ilr_rating) or None for a malformed line
+    # Check if the line contains exactly two parts separated by a tab and the ILR rating at the end
+    if "\t" in line:
+        parts = line.rsplit("\t", 2)  # Split into original text, translated text, and ILR rating
+        if len(parts) == 3:
+            original_text, translated_text, ilr_rating = parts
+            # Clean up and extract ILR rating (strip spaces)
+            ilr_rating = ilr_rating.strip()  # Keep it as a string, e.g., "1+", "2", etc.
+            return original_text, translated_text, ilr_rating
+    return None
+
+def iter_lines_with_offsets(file_path, lang_code, start_offset=0, start_line=0):
+    # (checkpoint byte offset, checkpoint line number, row or None) for every line from start_offset on.
+    # Lines end at "\n", "\r\n" or a lone "\r", as in text mode, but the checkpoint (what the ingest
+    # manifest stores and a resume or append restarts from) only ever moves past a "\n": a last line
+    # without one may still grow, and a trailing "\r" may still turn out to be half of a "\r\n".
+    # Lines after the checkpoint are read again on resume, the natural key drops their rows.
+    offset = start_offset
+    line_number = checkpoint_line = start_line
+    with open(file_path, "rb") as f:
+        f.seek(start_offset)
+        for raw_line in f:
+            pieces = raw_line.decode("utf-8").replace("\r\n", "\n").split("\r")
+            for index, line in enumerate(pieces):
+                last = index == len(pieces) - 1
+                if last and not line:
+                    # the file ends in a lone "\r", nothing follows it
+                    break
+                line_number += 1
+                if last and line.endswith("\n"):
+                    offset += len(raw_line)
+                    checkpoint_line = line_number
+                line = line.strip()  # Remove leading/trailing whitespace
+                if not line:  # Skip empty lines
+                    yield offset, checkpoint_line, None
+                    continue
+                parsed = parse_aligned_line(line)
+                if parsed is None:
+                    print(f"⚠️ Skipping malformed line in {file_path}: {line}")
+                    yield offset, checkpoint_line, None
+                    continue
+                yield offset, checkpoint_line, (lang_code, *parsed)
+
+def iter_rows(file_path, lang_code):
+    # Step 2: Read the aligned sentences, one database row per well-formed line
+    for _, _, row in iter_lines_with_offsets(file_path, lang_code):
+        if row is not None:
+            yield row
+
+def file_fingerprint(file_path, prefix_size=None):
+    # (size, sha256 of the file, sha256 of its first prefix_size bytes) in one read;
+    # the prefix hash tells whether a changed file only had lines appended
+    digest = hashlib.sha256()
+    prefix_hash = None
+    read = 0
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if prefix_size is not None and prefix_hash is None and read + len(chunk) >= prefix_size:
+                cut = prefix_size - read
+                digest.update(chunk[:cut])
+                prefix_hash = digest.hexdigest()
+                digest.update(chunk[cut:])
+            else:
+                digest.update(chunk)
+            read += len(chunk)
+            if not chunk:
+                break
+    return read, digest.hexdigest(), prefix_hash
+
+def copy_escape(value):
+    # COPY text format: backslash, tab and newlines have to be escaped
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def copy_rows(cursor, rows, table="text_data"):
+    buffer = io.StringIO()
+    buffer.writelines("\t".join(copy_escape(value) for value in row) + "\n" for row in rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({TEXT_DATA_COLUMNS}) FROM STDIN", buffer)
+
+def create_staging_table(cursor):
+    # COPY can't skip conflicts, so each batch is copied into a temp table and moved over with
+    # INSERT ... ON CONFLICT DO NOTHING on the natural key, which drops rows loaded before
+    cursor.execute(f"""
+        CREATE TEMP TABLE text_data_staging AS SELECT {TEXT_DATA_COLUMNS} FROM text_data WITH NO DATA
+    """)
+
+def insert_batch(cursor, rows):
+    # COPY one batch through the staging table, returns how many rows were new
+    copy_rows(cursor, rows, table="text_data_staging")
+    cursor.execute(f"""
+        INSERT INTO text_data ({TEXT_DATA_COLUMNS})
+        SELECT {TEXT_DATA_COLUMNS} FROM text_data_staging
+        ON CONFLICT (language, row_hash) DO NOTHING
+    """)
+    inserted = cursor.rowcount
+    cursor.execute("TRUNCATE text_data_staging")
+    return inserted
+
+def start_manifest_entry(cursor, manifest_key, file_path, verify=False):
+    # work out where to (re)start this file from its ingest_manifest row:
+    #   - same size and mtime: taken as unchanged without reading the file (unless verify), then as below
+    #   - same size and hash, complete: nothing to do
+    #   - same size and hash, still loading: resume after the last committed batch
+    #   - grown, and the old content is an unchanged prefix: lines were appended, continue from the old end
+    #   - anything else: load from the top, the natural key drops rows that are already there
+    cursor.execute("""
+        SELECT size_bytes, content_hash, byte_offset, line_number, rows_loaded, status, mtime_ns
+        FROM ingest_manifest WHERE path = %s
+    """, (manifest_key,))
+    entry = cursor.fetchone()
+    # stat before hashing, so a write during the hash shows up as a different mtime next run
+    stat = os.stat(file_path)
+    if entry and not verify and (entry[0], entry[6]) == (stat.st_size, stat.st_mtime_ns):
+        size, content_hash, prefix_hash = entry[0], entry[1], None
+    else:
+        size, content_hash, prefix_hash = file_fingerprint(file_path, entry[0] if entry else None)
+    start = (0, 0, 0)
+    state = "new"
+    if entry:
+        old_size, old_hash, byte_offset, line_number, rows_loaded, status, _ = entry
+        if (old_size, old_hash) == (size, content_hash):
+            state = "complete" if status == "complete" else "resume"
+            start = (byte_offset, line_number, rows_loaded)
+        elif size > old_size and prefix_hash == old_hash:
+            state = "append"
+            start = (byte_offset, line_number, rows_loaded)
+        else:
+            state = "changed"
+    if state != "complete":
+        cursor.execute("""
+            INSERT INTO ingest_manifest (path, size_bytes, content_hash, mtime_ns, byte_offset, line_number,
+                                         rows_loaded, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'loading')
+            ON CONFLICT (path) DO UPDATE SET
+                size_bytes = EXCLUDED.size_bytes, content_hash = EXCLUDED.content_hash, mtime_ns = EXCLUDED.mtime_ns,
+                byte_offset = EXCLUDED.byte_offset, line_number = EXCLUDED.line_number,
+                rows_loaded = EXCLUDED.rows_loaded, status = 'loading', updated_at = now()
+        """, (manifest_key, size, content_hash, stat.st_mtime_ns, *start))
+    elif entry[6] != stat.st_mtime_ns:
+        # touched but identical: remember the new mtime so the next run skips it without hashing
+        cursor.execute("UPDATE ingest_manifest SET mtime_ns = %s WHERE path = %s", (stat.st_mtime_ns, manifest_key))
+    return state, start
+
+def load_file_copy(file_path, lang_code, batch_size=DEFAULT_BATCH_SIZE, database_url=DATABASE_URL,
+                   processed_dir=PROCESSED_DIR, verify=False):
+    # stream one file into the database through COPY, committing every batch_size rows
+    # together with its ingest_manifest checkpoint, so a crash only loses the batch in flight
+    manifest_key = os.path.relpath(file_path, processed_dir)
+    conn = psycopg2.connect(database_url)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    row_count = 0
+    try:
+        state, (byte_offset, line_number, rows_loaded) = start_manifest_entry(cursor, manifest_key, file_path, verify)
+        conn.commit()
+        if state == "complete":
+            print(f"⏭️ Skipping {file_path}, unchanged since it was loaded")
+            return {"file": file_path, "rows": 0, "seconds": time.perf_counter() - start, "state": state}
+        if byte_offset:
+            print(f"↪️ {file_path}: {state} from line {line_number} (byte {byte_offset})")
+
+        create_staging_table(cursor)
+        conn.commit()
+        initial_rows_loaded = rows_loaded
+
+        def flush(batch, byte_offset, line_number):
+            nonlocal rows_loaded
+            rows_loaded += insert_batch(cursor, batch)
+            cursor.execute("""
+                UPDATE ingest_manifest SET byte_offset = %s, line_number = %s, rows_loaded = %s, updated_at = now()
+                WHERE path = %s
+            """, (byte_offset, line_number, rows_loaded, manifest_key))
+            conn.commit()
+
+        batch = []
+        for byte_offset, line_number, row in iter_lines_with_offsets(file_path, lang_code, byte_offset, line_number):
+            if row is None:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush(batch, byte_offset, line_number)
+                row_count += len(batch)
+                batch = []
+        if batch:
+            flush(batch, byte_offset, line_number)
+            row_count += len(batch)
+
+        cursor.execute("""
+            UPDATE ingest_manifest SET byte_offset = %s, line_number = %s, status = 'complete', updated_at = now()
+            WHERE path = %s
+        """, (byte_offset, line_number, manifest_key))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Processed {file_path}: {row_count} rows ({rows_loaded - initial_rows_loaded} new) in {elapsed:.1f}s "
+          f"({row_count / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return {"file": file_path, "rows": row_count, "seconds": elapsed, "state": state}
+
+def _load_file_copy_task(args):
+    return load_file_copy(*args)
+
+def store_data_insert(processed_dir=PROCESSED_DIR):
+    # original loader: one INSERT round trip per row, a single commit at the end
+    # Connect to the PostgreSQL database
+    conn = psycopg2.connect(DATABASE_URL)
+    cursor = conn.cursor()
+
+    # Step 1: Loop through the processed .txt files
+    for file_path, lang_code in find_aligned_files(processed_dir):
+        for row in iter_rows(file_path, lang_code):
+            # Step 3: Insert original, translated text, and ILR rating into the database
+            cursor.execute(f"""
+                INSERT INTO text_data ({TEXT_DATA_COLUMNS})
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (language, row_hash) DO NOTHING
+            """, row)
+
+        print(f"✅ Processed {file_path} and inserted data into the database.")
 
     # Commit the changes and close the connection
     conn.commit()
     cursor.close()
     conn.close()
 
+def store_data(mode="copy", batch_size=DEFAULT_BATCH_SIZE, workers=1, processed_dir=PROCESSED_DIR,
+               verify=False):
+    if mode == "insert":
+        store_data_insert(processed_dir)
+        return
+
+    aligned_files = find_aligned_files(processed_dir)
+    start = time.perf_counter()
+    tasks = [(file_path, lang_code, batch_size, DATABASE_URL, processed_dir, verify)
+             for file_path, lang_code in aligned_files]
+    if workers > 1:
+        # different files load in parallel, each worker process on its own connection
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_load_file_copy_task, tasks))
+    else:
+        results = [load_file_copy(*task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    total_rows = sum(result["rows"] for result in results)
+    print(f"\nLoaded {total_rows} rows from {len(results)} files in {elapsed:.1f}s "
+          f"({total_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return results
+
 if __name__ == "__main__":
-    store_data()
+    parser = argparse.ArgumentParser(description="Load rated aligned files into text_data")
+    parser.add_argument("--mode", choices=["copy", "insert"], default="copy",
+                        help="copy: batched COPY FROM STDIN (default), insert: one INSERT per row")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per COPY batch and commit")
+    parser.add_argument("--workers", type=int, default=1, help="files loaded in parallel, one connection each")
+    parser.add_argument("--processed-dir", default=PROCESSED_DIR)
+    parser.add_argument("--verify", action="store_true",
+                        help="hash every file, even those whose size and mtime match the manifest")
+    args = parser.parse_args()
+    store_data(args.mode, args.batch_size, args.workers, args.processed_dir, args.verify)
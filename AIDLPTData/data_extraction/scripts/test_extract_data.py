@@ -0,0 +1,111 @@
+import json
+import hashlib
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import extract_data
+
+CONTENT = bytes(range(256)) * 40
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # serves self.server.files with Range support, and answers the OPUS API at /api
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        self.server.requests.append((url.path, self.headers.get("Range")))
+        if url.path == "/api":
+            query = urllib.parse.parse_qs(url.query)
+            body = json.dumps({"corpora": [{"url": f"{self.server.base_url}/{query['corpus'][0]}/ms-en.txt.zip"}]})
+            return self.reply(200, body.encode())
+        data = self.server.files.get(url.path)
+        if data is None:
+            return self.reply(404, b"")
+        byte_range = self.headers.get("Range")
+        if byte_range and self.server.ranges:
+            start = int(byte_range[len("bytes="):].split("-")[0])
+            if start >= len(data):
+                return self.reply(416, b"", {"Content-Range": f"bytes */{len(data)}"})
+            return self.reply(206, data[start:], {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"})
+        self.reply(200, data)
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in {"Content-Length": str(len(body)), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.files = {"/corpus/ms-en.txt.zip": CONTENT}
+    httpd.requests = []
+    httpd.ranges = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_resumes_a_partial_download_with_a_range_request(tmp_path, server):
+    path = tmp_path / "corpus.zip"
+    (tmp_path / "corpus.zip.part").write_bytes(CONTENT[:1000])
+    size, sha256 = extract_data.download_file(f"{server.base_url}/corpus/ms-en.txt.zip", str(path),
+                                              len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+    assert (size, sha256) == (len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+    assert path.read_bytes() == CONTENT
+    assert server.requests == [("/corpus/ms-en.txt.zip", "bytes=1000-")]
+    assert not (tmp_path / "corpus.zip.part").exists()
+
+def test_restarts_when_the_server_ignores_the_range(tmp_path, server):
+    server.ranges = False
+    path = tmp_path / "corpus.zip"
+    (tmp_path / "corpus.zip.part").write_bytes(CONTENT[:1000])
+    extract_data.download_file(f"{server.base_url}/corpus/ms-en.txt.zip", str(path))
+    assert path.read_bytes() == CONTENT
+
+def test_checksum_mismatch_discards_the_resumed_bytes(tmp_path, server):
+    # a corrupt partial file: resuming completes it to the right size but the wrong hash
+    path = tmp_path / "corpus.zip"
+    (tmp_path / "corpus.zip.part").write_bytes(b"\0" * 1000)
+    extract_data.download_file(f"{server.base_url}/corpus/ms-en.txt.zip", str(path), None,
+                               hashlib.sha256(CONTENT).hexdigest(), retries=2)
+    assert path.read_bytes() == CONTENT
+    assert [header for _, header in server.requests] == ["bytes=1000-", None]
+
+def test_checksum_mismatch_gives_up_without_keeping_the_file(tmp_path, server):
+    path = tmp_path / "corpus.zip"
+    with pytest.raises(RuntimeError):
+        extract_data.download_file(f"{server.base_url}/corpus/ms-en.txt.zip", str(path), None, "0" * 64,
+                                   retries=2)
+    assert not path.exists()
+    assert not (tmp_path / "corpus.zip.part").exists()
+    assert len(server.requests) == 2
+
+def test_skips_files_recorded_in_the_manifest(tmp_path, server):
+    config = tmp_path / "datasets.json"
+    config.write_text(json.dumps([{"src": "en", "tgt": "ms", "dataset": "corpus"}]))
+    download_dir = tmp_path / "raw"
+    api_url = f"{server.base_url}/api"
+
+    first = extract_data.main(str(config), str(download_dir), workers=2, api_url=api_url)
+    assert [result["status"] for result in first] == ["downloaded"]
+    recorded = json.loads((download_dir / extract_data.MANIFEST_NAME).read_text())
+    assert recorded["corpus.ms-en.txt.zip"]["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+
+    server.requests.clear()
+    second = extract_data.main(str(config), str(download_dir), workers=2, api_url=api_url)
+    assert [result["status"] for result in second] == ["skipped"]
+    assert [path for path, _ in server.requests] == ["/api"]
+
+    # a file that no longer matches its manifest entry is downloaded again
+    (download_dir / "corpus.ms-en.txt.zip").write_bytes(b"truncated")
+    third = extract_data.main(str(config), str(download_dir), workers=2, api_url=api_url)
+    assert [result["status"] for result in third] == ["downloaded"]
+    assert (download_dir / "corpus.ms-en.txt.zip").read_bytes() == CONTENT
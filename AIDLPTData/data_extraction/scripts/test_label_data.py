@@ -0,0 +1,82 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import label_data
+
+SEARCHED = ["complex_words", "abstract_concepts", "emotional_content", "scientific_terms", "opinion_indicators"]
+
+def probe_words(pattern):
+    # the keywords themselves, their prefixes and keywords embedded in longer words, in mixed case
+    words = {"", "x", "the", "and", "1234"}
+    for keyword in pattern.split("|"):
+        words.update({keyword, keyword[:-1], keyword[1:], f"pre{keyword}", f"{keyword}nya", keyword.upper(),
+                      keyword.capitalize(), f"{keyword} {keyword[:2]}"})
+    return sorted(words)
+
+@pytest.mark.parametrize("language_code", sorted(label_data.language_patterns))
+@pytest.mark.parametrize("category", SEARCHED)
+def test_keyword_trie_searches_like_the_keyword_list(language_code, category):
+    pattern = label_data.language_patterns[language_code][category]
+    plain = re.compile(pattern, re.IGNORECASE)
+    trie = re.compile(label_data.keyword_trie_regex(pattern), re.IGNORECASE)
+    for word in probe_words(pattern):
+        assert (trie.search(word) is None) == (plain.search(word) is None), word
+
+def test_keyword_trie_leaves_real_regexes_alone():
+    assert label_data.keyword_trie_regex(r"\b(?:a|b)\b") == r"\b(?:a|b)\b"
+    assert label_data.keyword_trie_regex("a||b") == "a||b"
+    assert label_data.keyword_trie_regex("pembangunan|pemikiran|pem") == "pem(?:(?:bangunan|ikiran))?"
+
+@pytest.mark.parametrize("language_code", sorted(label_data.language_patterns))
+def test_memoized_complex_word_count_matches_a_plain_search(language_code):
+    patterns = label_data.language_patterns[language_code]
+    compiled = label_data.compile_language_patterns(patterns)
+    plain = re.compile(patterns["complex_words"], re.IGNORECASE)
+    words = probe_words(patterns["complex_words"]) * 2
+    for min_length in (None, 8):
+        expected = sum(1 for word in words
+                       if (min_length is not None and len(word) > min_length) or plain.search(word))
+        assert label_data.count_complex_words(words, compiled, min_length) == expected
+
+def write_aligned_file(path, lines=300):
+    # a mix of short and long targets, blank lines, a line without a tab and CRLF endings
+    words = ["rumah", "pembangunan", "kerajaan", "ekonomi", "kebudayaan", "saya", "pergi", "ke", "pasar", "dan"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i in range(lines):
+            target = " ".join(words[(i * 7 + j) % len(words)] for j in range(3 + i % 25))
+            ending = "\r\n" if i % 11 == 0 else "\n"
+            f.write(f"sentence {i}\t{target}.{ending}")
+            if i % 50 == 0:
+                f.write("\n")
+            if i == 123:
+                f.write("no tab on this line\n")
+
+@pytest.mark.parametrize("chunk_size", [64, 1000, 1 << 20])
+def test_parallel_labeling_matches_serial(tmp_path, capsys, chunk_size):
+    input_path = tmp_path / "corpus.en-ms_aligned.txt"
+    write_aligned_file(input_path)
+
+    def total_lines_message():
+        return [line for line in capsys.readouterr().out.splitlines() if "total lines" in line]
+
+    serial = label_data.process_translation_file(str(input_path), str(tmp_path / "serial.txt"))
+    serial_message = total_lines_message()
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        parallel = label_data.process_translation_file(str(input_path), str(tmp_path / "parallel.txt"), executor,
+                                                       workers=2, chunk_size=chunk_size)
+    assert total_lines_message() == serial_message
+    assert parallel["line_count"] == serial["line_count"]
+    assert (tmp_path / "parallel.txt").read_bytes() == (tmp_path / "serial.txt").read_bytes()
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_process_all_files_matches_across_worker_counts(tmp_path):
+    input_dir = tmp_path / "aligned"
+    input_dir.mkdir()
+    write_aligned_file(input_dir / "a.en-ms_aligned.txt")
+    write_aligned_file(input_dir / "b.en-tg_aligned.txt", lines=120)
+    label_data.process_all_files(str(input_dir), str(tmp_path / "one"), workers=1)
+    label_data.process_all_files(str(input_dir), str(tmp_path / "two"), workers=2, chunk_size=256)
+    for name in ("rated_a.en-ms_aligned.txt", "rated_b.en-tg_aligned.txt"):
+        assert (tmp_path / "two" / name).read_bytes() == (tmp_path / "one" / name).read_bytes()
@@ -0,0 +1,67 @@
+import os
+import sys
+import psycopg2
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# arbitrary key for pg_advisory_lock, keeps two migrators from racing each other
+MIGRATION_LOCK_ID = 7314201
+
+
+def pending_migrations(applied, migrations_dir=MIGRATIONS_DIR):
+    # migrations are applied in file name order: 0001_..., 0002_..., ...
+    for file in sorted(os.listdir(migrations_dir)):
+        version = os.path.splitext(file)[0]
+        if file.endswith(".sql") and version not in applied:
+            yield version, os.path.join(migrations_dir, file)
+
+
+def apply_migrations(database_url=DATABASE_URL, migrations_dir=MIGRATIONS_DIR):
+    conn = psycopg2.connect(database_url)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        conn.commit()
+
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        count = 0
+        for version, path in pending_migrations(applied, migrations_dir):
+            with open(path, "r", encoding="utf-8") as f:
+                statements = f.read()
+            # each migration and its bookkeeping row commit together, or not at all
+            try:
+                cursor.execute(statements)
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+            except psycopg2.Error as error:
+                conn.rollback()
+                print(f"❌ Migration {version} failed: {error}")
+                raise
+            print(f"✅ Applied {version}")
+            count += 1
+
+        if not count:
+            print("Database schema is up to date")
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # optionally pass the connection string on the command line instead of DATABASE_URL
+    apply_migrations(sys.argv[1] if len(sys.argv) > 1 else DATABASE_URL)
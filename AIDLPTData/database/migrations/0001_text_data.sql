@@ -0,0 +1,44 @@
+-- text_data as written by data_extraction/scripts/store_data.py and read by backend/app.py.
+--
+-- List-partitioned by language: every API query filters on one language, so it only ever
+-- touches that language's partition. Rows are only ever appended, so heap and index pages are
+-- packed full (fillfactor 100) and a BRIN index covers id range scans at a fraction of a btree's size.
+
+-- An older database may still have the unpartitioned table from the first init script,
+-- keep it (and its data) out of the way under text_data_legacy.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+               WHERE c.relname = 'text_data' AND n.nspname = current_schema() AND c.relkind = 'r') THEN
+        ALTER TABLE text_data RENAME TO text_data_legacy;
+        IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'text_data_pkey'
+                   AND conrelid = 'text_data_legacy'::regclass) THEN
+            ALTER TABLE text_data_legacy RENAME CONSTRAINT text_data_pkey TO text_data_legacy_pkey;
+        END IF;
+        ALTER SEQUENCE IF EXISTS text_data_id_seq RENAME TO text_data_legacy_id_seq;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS text_data (
+    id BIGSERIAL,
+    language TEXT NOT NULL,
+    english_text TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    ilr_level TEXT NOT NULL,
+    -- the partition key has to be part of the primary key; (language, id) also serves
+    -- the keyset pagination in /get_text (language = ? AND id > ? ORDER BY id)
+    PRIMARY KEY (language, id) WITH (fillfactor = 100)
+) PARTITION BY LIST (language);
+
+-- one partition per target language loaded by the pipeline, anything else lands in the default
+CREATE TABLE IF NOT EXISTS text_data_ms PARTITION OF text_data FOR VALUES IN ('ms') WITH (fillfactor = 100);
+CREATE TABLE IF NOT EXISTS text_data_ta PARTITION OF text_data FOR VALUES IN ('ta') WITH (fillfactor = 100);
+CREATE TABLE IF NOT EXISTS text_data_tg PARTITION OF text_data FOR VALUES IN ('tg') WITH (fillfactor = 100);
+CREATE TABLE IF NOT EXISTS text_data_default PARTITION OF text_data DEFAULT WITH (fillfactor = 100);
+
+-- /get_text?language=..&ilr_level=..&after_id=..
+CREATE INDEX IF NOT EXISTS text_data_language_ilr_level_id_idx
+    ON text_data (language, ilr_level, id) WITH (fillfactor = 100);
+
+-- ids grow with load order, so block ranges map to tight id ranges
+CREATE INDEX IF NOT EXISTS text_data_id_brin_idx ON text_data USING BRIN (id);
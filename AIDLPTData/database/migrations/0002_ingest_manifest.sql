@@ -0,0 +1,33 @@
+-- Incremental loading support for data_extraction/scripts/store_data.py.
+
+-- Natural key: a (language, english, translation) pair is stored once, so re-loading a file
+-- inserts nothing new. The hash keeps the unique index small; a unique index on a partitioned
+-- table has to include the partition key and cannot be built on an expression, hence the column.
+ALTER TABLE text_data ADD COLUMN IF NOT EXISTS row_hash TEXT
+    GENERATED ALWAYS AS (md5(english_text || E'\t' || translated_text)) STORED;
+
+-- rows duplicated by earlier full re-loads: keep the first copy
+DELETE FROM text_data t
+    USING text_data d
+    WHERE t.language = d.language AND t.row_hash = d.row_hash AND t.id > d.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'text_data_natural_key'
+                   AND conrelid = 'text_data'::regclass) THEN
+        ALTER TABLE text_data ADD CONSTRAINT text_data_natural_key UNIQUE (language, row_hash);
+    END IF;
+END $$;
+
+-- One row per ingested file: what was loaded (size + content hash) and how far the last
+-- committed batch got, so an interrupted load resumes instead of starting over.
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    path TEXT PRIMARY KEY,
+    size_bytes BIGINT NOT NULL,
+    content_hash TEXT NOT NULL,
+    byte_offset BIGINT NOT NULL DEFAULT 0,
+    line_number BIGINT NOT NULL DEFAULT 0,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'loading' CHECK (status IN ('loading', 'complete')),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,5 @@
+-- Lets data_extraction/scripts/store_data.py skip unchanged files without reading them: a file
+-- whose size and modification time (in nanoseconds) still match its manifest row is taken as
+-- unchanged and not hashed. NULL for rows written before this column existed, those files are
+-- hashed once more on the next run and get their mtime recorded.
+ALTER TABLE ingest_manifest ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;